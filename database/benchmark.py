@@ -0,0 +1,271 @@
+"""Нагрузочные замеры для `database.StorageAdapter`.
+
+Каждый замер работает во временной директории и возвращает запись с числом операций и
+временем. Результаты можно сохранить в JSON и сравнить с сохраненным ранее базовым прогоном.
+"""
+from argparse import ArgumentParser
+from collections.abc import Callable
+from multiprocessing import get_context
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import json
+import platform
+import random
+import sys
+import time
+
+from database import SegmentStorageAdapter, StorageAdapter
+
+
+VALUE = "value" * 20
+
+# Конфигурации хранилища, на которых гоняются замеры.
+ENGINES: dict[str, Callable[..., StorageAdapter]] = {
+    "file": lambda directory, **kwargs: StorageAdapter(_storage_directory=directory, **kwargs),
+    "file-binary": lambda directory, **kwargs: StorageAdapter(
+        _storage_directory=directory, record_format="binary", checksum="crc32", **kwargs
+    ),
+    "file-sharded": lambda directory, **kwargs: StorageAdapter(
+        _storage_directory=directory, fanout=2, **kwargs
+    ),
+    "segment": lambda directory, **kwargs: SegmentStorageAdapter(_storage_directory=directory, **kwargs),
+}
+
+# Замеры, которые конфигурация не поддерживает: у сегментного хранилища нет кеша чтения.
+UNSUPPORTED: set[tuple[str, str]] = {("segment", "get_cache_cold"), ("segment", "get_cache_warm")}
+
+
+def _keys(size: int) -> list[str]:
+    """Ключи замера."""
+    return [f"key_{index}" for index in range(size)]
+
+
+def _fill(adapter: StorageAdapter, size: int) -> None:
+    """Заполнить хранилище одной транзакцией."""
+    with adapter:
+        adapter.update_many({key: VALUE for key in _keys(size)})
+
+
+def _timed(func: Callable[[], object]) -> float:
+    """Время выполнения функции в секундах."""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_update(engine: Callable[..., StorageAdapter], directory: Path, size: int, order: str) -> tuple[int, float]:
+    """Запись `size` ключей по одной транзакции на ключ."""
+    adapter = engine(directory)
+    keys = _keys(size)
+    if order == "random":
+        random.Random(0).shuffle(keys)
+
+    def run() -> None:
+        for key in keys:
+            with adapter:
+                adapter.update(key, VALUE)
+
+    return size, _timed(run)
+
+
+def bench_get(engine: Callable[..., StorageAdapter], directory: Path, size: int, order: str) -> tuple[int, float]:
+    """Чтение `size` ключей по одному."""
+    adapter = engine(directory)
+    _fill(adapter, size)
+    keys = _keys(size)
+    if order == "random":
+        random.Random(0).shuffle(keys)
+    return size, _timed(lambda: [adapter.get(key) for key in keys])
+
+
+def bench_transaction(engine: Callable[..., StorageAdapter], directory: Path, size: int,
+                      operations: int) -> tuple[int, float]:
+    """Транзакции по `operations` операций, всего около `size` операций."""
+    adapter = engine(directory)
+    keys = _keys(size)
+    transactions = max(1, size // operations)
+
+    def run() -> None:
+        for transaction in range(transactions):
+            with adapter:
+                for index in range(operations):
+                    adapter.update(keys[(transaction * operations + index) % size], VALUE)
+
+    return transactions * operations, _timed(run)
+
+
+def bench_clear(engine: Callable[..., StorageAdapter], directory: Path, size: int) -> tuple[int, float]:
+    """Очистка хранилища из `size` ключей."""
+    adapter = engine(directory)
+    _fill(adapter, size)
+
+    def run() -> None:
+        with adapter:
+            adapter.clear()
+
+    return size, _timed(run)
+
+
+def bench_rollback(engine: Callable[..., StorageAdapter], directory: Path, size: int) -> tuple[int, float]:
+    """Накопление `size` операций с последующим откатом."""
+    adapter = engine(directory)
+
+    def run() -> None:
+        for key in _keys(size):
+            adapter.update(key, VALUE)
+        adapter.rollback()
+
+    return size, _timed(run)
+
+
+def bench_cache(engine: Callable[..., StorageAdapter], directory: Path, size: int, warm: bool) -> tuple[int, float]:
+    """Чтение всех ключей через кеш: холодный (пустой) или прогретый."""
+    _fill(engine(directory), size)
+    adapter = engine(directory, cache_size=size)
+    keys = _keys(size)
+    if warm:
+        adapter.get_many(keys)
+    return size, _timed(lambda: [adapter.get(key) for key in keys])
+
+
+# Имя замера -> функция от (хранилище, директория, размер).
+WORKLOADS: dict[str, Callable[[Callable[..., StorageAdapter], Path, int], tuple[int, float]]] = {
+    "update_sequential": lambda engine, directory, size: bench_update(engine, directory, size, "sequential"),
+    "update_random": lambda engine, directory, size: bench_update(engine, directory, size, "random"),
+    "get_sequential": lambda engine, directory, size: bench_get(engine, directory, size, "sequential"),
+    "get_random": lambda engine, directory, size: bench_get(engine, directory, size, "random"),
+    "transaction_1": lambda engine, directory, size: bench_transaction(engine, directory, size, 1),
+    "transaction_100": lambda engine, directory, size: bench_transaction(engine, directory, size, 100),
+    "transaction_10000": lambda engine, directory, size: bench_transaction(engine, directory, size, 10_000),
+    "clear": bench_clear,
+    "rollback": bench_rollback,
+    "get_cache_cold": lambda engine, directory, size: bench_cache(engine, directory, size, False),
+    "get_cache_warm": lambda engine, directory, size: bench_cache(engine, directory, size, True),
+}
+
+
+def run_workload(engine_name: str, workload: str, size: int) -> dict:
+    """Выполнить один замер в чистой временной директории."""
+    with TemporaryDirectory() as directory:
+        operations, seconds = WORKLOADS[workload](ENGINES[engine_name], Path(directory) / "storage", size)
+    return {
+        "engine": engine_name,
+        "workload": workload,
+        "operations": operations,
+        "seconds": seconds,
+        "ops_per_second": operations / seconds if seconds else float("inf"),
+    }
+
+
+def _writer(directory: Path, worker: int, transactions: int, keys_per_transaction: int,
+            key_space: int, fanout: int) -> None:
+    """Процесс-писатель: коммитит транзакции по случайным ключам из общего пространства."""
+    rng = random.Random(worker)
+    adapter = StorageAdapter(_storage_directory=directory, fanout=fanout, multi_writer=True)
+    for transaction in range(transactions):
+        with adapter:
+            for _ in range(keys_per_transaction):
+                adapter.update(f"key_{rng.randrange(key_space)}", f"value_{worker}_{transaction}")
+
+
+def bench_multiprocess(processes: int, transactions: int = 200, keys_per_transaction: int = 10,
+                       key_space: int = 1000, fanout: int = 0) -> dict:
+    """Замерить пропускную способность коммитов при нескольких процессах-писателях."""
+    context = get_context("fork")
+    with TemporaryDirectory() as directory:
+        workers = [
+            context.Process(
+                target=_writer,
+                args=(Path(directory), worker, transactions, keys_per_transaction, key_space, fanout),
+            )
+            for worker in range(processes)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+    commits = processes * transactions
+    return {
+        "engine": "file-multi-writer",
+        "workload": f"multiprocess_{processes}",
+        "operations": commits,
+        "seconds": elapsed,
+        "ops_per_second": commits / elapsed,
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[dict]:
+    """Сравнить результаты с базовым прогоном.
+
+    Возвращает записи замеров, пропускная способность которых упала больше чем на `tolerance`.
+    """
+    previous = {(record["engine"], record["workload"]): record for record in baseline}
+    regressions = list()
+    for record in results:
+        old = previous.get((record["engine"], record["workload"]))
+        if old is None:
+            continue
+        record["baseline_ops_per_second"] = old["ops_per_second"]
+        record["ratio"] = record["ops_per_second"] / old["ops_per_second"]
+        if record["ratio"] < 1 - tolerance:
+            regressions.append(record)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Запустить замеры из командной строки."""
+    parser = ArgumentParser(prog="benchmark")
+    parser.add_argument("-s", "--size", type=int, default=10_000, help="Число ключей в замере")
+    parser.add_argument("-e", "--engine", action="append", choices=sorted(ENGINES), default=None)
+    parser.add_argument("-w", "--workload", action="append", choices=sorted(WORKLOADS), default=None)
+    parser.add_argument(
+        "-p", "--processes",
+        type=int,
+        nargs="*",
+        default=[],
+        help="Числа процессов для замера нескольких писателей (например: 1 2 4 8 16)"
+    )
+    parser.add_argument("-o", "--output", type=Path, default=None, help="Куда сохранить результаты в JSON")
+    parser.add_argument("-b", "--baseline", type=Path, default=None, help="JSON базового прогона")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.2, help="Допустимое падение (доля)")
+    args = parser.parse_args(argv)
+
+    results = [
+        run_workload(engine, workload, args.size)
+        for engine in args.engine or ENGINES
+        for workload in args.workload or WORKLOADS
+        if (engine, workload) not in UNSUPPORTED
+    ]
+    results.extend(bench_multiprocess(processes) for processes in args.processes)
+
+    regressions = list()
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance)
+
+    for record in results:
+        line = f"{record['engine']:>18} {record['workload']:>20}: {record['ops_per_second']:12.1f} оп/с"
+        if "ratio" in record:
+            line += f" ({record['ratio']:.2f}x от базового)"
+        print(line)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": args.size,
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if regressions:
+        for record in regressions:
+            print(f"Регрессия: {record['engine']} {record['workload']}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
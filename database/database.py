@@ -1,10 +1,56 @@
 from abc import abstractmethod
-from dataclasses import dataclass
+from argparse import ArgumentParser
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, field
 from pathlib import Path
 from types import TracebackType
-from typing import Protocol, Callable
+from typing import BinaryIO, Iterator, Protocol, Callable
+from uuid import uuid4
+import copy
+import fcntl
 import hashlib
 import json
+import mmap
+import os
+import shutil
+import string
+import struct
+import threading
+import weakref
+import zlib
+
+
+_JOURNALS_NAME = ".journals"
+_JOURNAL_NAME = "journal"
+_PENDING_PREFIX = "pending-"
+_LOCKS_NAME = ".locks"
+_GLOBAL_LOCK = "global"
+# Группа в журнале: контрольная сумма и длина тела группы.
+_JOURNAL_RECORD = struct.Struct("<32sQ")
+# Запись группы: имя файла ключа, флаг наличия содержимого, длина содержимого.
+_JOURNAL_ENTRY = struct.Struct("<64sBQ")
+
+# Бинарный формат файла ключа: сигнатура, алгоритм контрольной суммы, тип значения, длина значения.
+_FILE_MAGIC = b"KVS\x01"
+_FILE_HEADER = struct.Struct("<4sBBQ")
+_CHECKSUM_ALGORITHMS = ("sha256", "crc32")
+_CHECKSUM_SIZES = (32, 4)
+_VALUE_STR = 0
+_VALUE_BYTES = 1
+# Прочие значения (числа, списки, словари) хранятся в JSON, чтобы читаться с тем же типом.
+_VALUE_JSON = 2
+
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".log"
+
+# Заголовок записи сегмента: хеш ключа, контрольная сумма, тип операции, длина значения.
+_RECORD_HEADER = struct.Struct("<32s32sBI")
+_OP_PUT = 0
+_OP_DELETE = 1
+_OP_COMMIT = 2
 
 
 class SupportsStr(Protocol):
@@ -15,14 +61,172 @@ class SupportsStr(Protocol):
         """Привести тип к `str`"""
 
 
+@dataclass
+class _Batch:
+    """Свернутая группа операций одной транзакции.
+
+    Для каждого ключа остается только последняя операция: значение для записи или `None`
+    для удаления. Флаг `clear` означает, что перед применением хранилище очищается.
+    """
+
+    clear: bool = False
+    records: dict[str, SupportsStr | None] = field(default_factory=dict)
+
+
+@dataclass
+class CacheStats:
+    """Счетчики кеша чтения."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    revalidation_failures: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Доля чтений, обслуженных из кеша."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class IntegrityError(ValueError):
+    """Значение не прошло проверку контрольной суммы."""
+
+
+class ValueView:
+    """Значение в виде буфера без копирования, например поверх отображенного в память файла.
+
+    Контрольная сумма проверяется лениво: явно через `verify` или по ходу чтения через `chunks`.
+    """
+
+    def __init__(self, buffer: memoryview, hasher=None, expected: bytes | None = None,
+                 mapped: mmap.mmap | None = None) -> None:
+        self._buffer = buffer
+        self._hasher = hasher
+        self._expected = expected
+        self._mapped = mapped
+        self.verified: bool | None = True if hasher is None else None
+
+    @classmethod
+    def from_value(cls, value: SupportsStr) -> 'ValueView':
+        """Обернуть уже проверенное значение, прочитанное в память."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return cls(memoryview(value))
+        return cls(memoryview(str(value).encode()))
+
+    @property
+    def buffer(self) -> memoryview:
+        """Буфер значения. Целостность к этому моменту может быть еще не проверена."""
+        return self._buffer
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def verify(self, chunk_size: int = 1 << 20) -> bool:
+        """Проверить контрольную сумму значения, если она еще не проверена."""
+        if self.verified is None:
+            for _ in self.chunks(chunk_size, strict=False):
+                pass
+        return bool(self.verified)
+
+    def chunks(self, chunk_size: int = 1 << 20, strict: bool = True) -> Iterator[memoryview]:
+        """Отдавать значение кусками, попутно считая контрольную сумму.
+
+        Если сумма не сошлась, после последнего куска бросается `IntegrityError`
+        (при `strict=False` результат только записывается в `verified`).
+        """
+        hasher = self._hasher if self.verified is None else None
+        for offset in range(0, len(self._buffer), chunk_size):
+            chunk = self._buffer[offset:offset + chunk_size]
+            if hasher is not None:
+                hasher.update(chunk)
+            yield chunk
+        if hasher is not None:
+            self.verified = hasher.digest() == self._expected
+        if strict and self.verified is False:
+            raise IntegrityError("Контрольная сумма значения не совпала")
+
+    def release(self) -> None:
+        """Освободить буфер и отображение файла.
+
+        Куски из `chunks` и срезы `buffer` ссылаются на отображение, поэтому их нужно освободить
+        раньше. Иначе бросается `BufferError`, а отображение остается открытым до повторного вызова.
+        """
+        self._buffer.release()
+        if self._mapped is not None and not self._mapped.closed:
+            try:
+                self._mapped.close()
+            except BufferError:
+                raise BufferError("Буфер значения еще используется: освободите куски и срезы до release") from None
+
+    def __enter__(self) -> 'ValueView':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.release()
+
+
 @dataclass
 class StorageAdapter:
     """Адаптер базы данных."""
 
     _storage_directory: Path
+    # Число значений в LRU-кеше чтения; 0 отключает кеш.
+    cache_size: int = 0
+    # Число потоков для файловых операций пакетных методов.
+    max_workers: int = 8
+    # Формат файлов ключей: "json" (как в README) или компактный "binary".
+    record_format: str = "json"
+    # Контрольная сумма бинарного формата: "sha256" или быстрая некриптографическая "crc32".
+    checksum: str = "sha256"
+    # Число первых hex-цифр имени файла, задающих поддиректорию-шард; 0 - плоская раскладка.
+    fanout: int = 0
+    # Режим нескольких процессов-писателей на одной директории.
+    multi_writer: bool = False
+    # Размер журнала в байтах, после которого примененные группы сбрасываются на диск
+    # одним `os.sync` и журнал удаляется (контрольная точка).
+    checkpoint_bytes: int = 64 * 1024 * 1024
 
     def __post_init__(self) -> None:
+        self._validate_options()
         self.storage_queue: list[tuple] = list()
+        self._batch = _Batch()
+        self._journal_name = f"{_JOURNAL_NAME}-{uuid4().hex}" if self.multi_writer else _JOURNAL_NAME
+        self._pool: ThreadPoolExecutor | None = None
+        self._replay_needed = False
+        self._cache: OrderedDict[str, tuple[tuple[int, int, int], SupportsStr]] = OrderedDict()
+        self.cache_stats = CacheStats()
+        if self._storage_directory.is_dir():
+            self._startup_recover()
+
+    def _validate_options(self) -> None:
+        """Проверить значения параметров хранилища."""
+        if self.record_format not in ("json", "binary"):
+            raise ValueError(f"Неизвестный формат записи: {self.record_format}")
+        if self.checksum not in _CHECKSUM_ALGORITHMS:
+            raise ValueError(f"Неизвестная контрольная сумма: {self.checksum}")
+        if not 0 <= self.fanout < 64:
+            raise ValueError(f"Недопустимый fanout: {self.fanout}")
+
+    def _startup_recover(self) -> None:
+        """Доприменить прерванные коммиты при открытии хранилища.
+
+        С несколькими писателями восстановление идет под исключительной общей блокировкой:
+        пишущие процессы держат ее разделяемой весь коммит, поэтому их журналы, в том числе
+        только что созданные и еще не заблокированные, не принимаются за брошенные.
+        """
+        if not self.multi_writer:
+            self._recover()
+            return
+        locks = self._storage_directory / _LOCKS_NAME
+        locks.mkdir(exist_ok=True)
+        with _flock(locks / _GLOBAL_LOCK, fcntl.LOCK_EX):
+            self._recover()
 
     @staticmethod
     def defer(func: Callable) -> Callable:
@@ -39,58 +243,437 @@ class StorageAdapter:
         if not self._storage_directory.exists():
             self._storage_directory.mkdir(parents=True, exist_ok=True)
 
+    def _key_path(self, key: str) -> Path:
+        """Получить путь к файлу ключа."""
+        return _shard_path(self._storage_directory, hashlib.sha256(key.encode()).hexdigest(), self.fanout)
+
     def get(self, key: SupportsStr) -> str | None:
-        """Получить объект, если он существует."""
+        """Получить объект, если он существует.
+
+        При включенном кеше значение берется из памяти, если файл ключа не менялся с момента
+        чтения: совпадают inode, размер и время изменения. Иначе файл перечитывается и заново
+        проверяется хеш, так что подмена файла извне по-прежнему обнаруживается. Из кеша
+        отдается копия значения, чтобы изменение результата не портило следующие чтения.
+        """
+        path = self._key_path(str(key))
         self._is_directory_exists()
-        path = self._storage_directory / hashlib.sha256(str(key).encode()).hexdigest()
-        if path.exists():
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    hash = hashlib.sha256()
-                    hash.update(str(key).encode())
-                    hash.update(str(data["value"]).encode())
-                    if data["hash"] == str(hash.hexdigest()):
-                        return data["value"]
-            except json.JSONDecodeError:
-                return None
+        if not self.cache_size:
+            return self._read_file(str(key), path)[0]
+
+        resolved, value = self._cache_lookup(path)
+        if resolved:
+            return _copy_value(value)
+        value, signature = self._read_file(str(key), path)
+        self._cache_store(path, signature, value)
+        return value
+
+    def get_many(self, keys: Iterable[SupportsStr]) -> list[str | None]:
+        """Получить значения сразу для нескольких ключей в порядке ключей.
+
+        Проверка директории выполняется один раз, а файлы читаются параллельно в пуле потоков.
+        """
+        keys = [str(key) for key in keys]
+        paths = [self._key_path(key) for key in keys]
+        self._is_directory_exists()
+        if not self.cache_size:
+            return [value for value, _ in self._map(self._read_file, keys, paths)]
+
+        values: list[str | None] = [None] * len(keys)
+        misses = list()
+        for index, path in enumerate(paths):
+            resolved, value = self._cache_lookup(path)
+            values[index] = _copy_value(value)
+            if not resolved:
+                misses.append(index)
+        results = self._map(self._read_file, [keys[i] for i in misses], [paths[i] for i in misses])
+        for index, (value, signature) in zip(misses, results):
+            values[index] = value
+            self._cache_store(paths[index], signature, value)
+        return values
+
+    def get_view(self, key: SupportsStr) -> ValueView | None:
+        """Получить значение как буфер без копирования в кучу Python.
+
+        Для бинарного формата файл ключа отображается в память, структура заголовка проверяется
+        сразу, а контрольная сумма - лениво (см. `ValueView`). Файлы в JSON-формате и значения,
+        которые не являются строкой или байтами, не хранятся в сыром виде, поэтому для них
+        значение читается обычным `get`.
+        """
+        path = self._key_path(str(key))
+        self._is_directory_exists()
+        try:
+            with open(path, 'rb') as f:
+                if f.read(len(_FILE_MAGIC)) != _FILE_MAGIC:
+                    value = self.get(key)
+                    return None if value is None else ValueView.from_value(value)
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mapped) >= _FILE_HEADER.size:
+            _, algorithm, value_type, length = _FILE_HEADER.unpack_from(mapped)
+            if value_type == _VALUE_JSON:
+                mapped.close()
+                value = self.get(key)
+                return None if value is None else ValueView.from_value(value)
+            if algorithm < len(_CHECKSUM_ALGORITHMS) and value_type in (_VALUE_STR, _VALUE_BYTES):
+                start = _FILE_HEADER.size + _CHECKSUM_SIZES[algorithm]
+                if start + length == len(mapped):
+                    expected = mapped[_FILE_HEADER.size:start]
+                    hasher = _checksum_hasher(algorithm, str(key).encode())
+                    return ValueView(memoryview(mapped)[start:], hasher, expected, mapped)
+        mapped.close()
         return None
 
+    def _map(self, func: Callable, *iterables: Iterable) -> list:
+        """Применить функцию к аргументам, распределив вызовы по пулу потоков.
+
+        Пул создается при первом обращении и живет до `close` (или сборки адаптера).
+        """
+        args = [list(iterable) for iterable in iterables]
+        if self.max_workers <= 1 or len(args[0]) < 2 * self.max_workers:
+            return list(map(func, *args))
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            weakref.finalize(self, self._pool.shutdown, wait=False)
+        return list(self._pool.map(func, *args))
+
+    def close(self) -> None:
+        """Сделать контрольную точку журнала и остановить пул потоков пакетных методов."""
+        self._checkpoint()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _cache_lookup(self, path: Path) -> tuple[bool, SupportsStr | None]:
+        """Найти значение в кеше.
+
+        Возвращает `(True, значение)`, если чтение файла не нужно: попадание в кеш или файла
+        нет. Иначе - `(False, None)`.
+        """
+        try:
+            signature = _file_signature(os.stat(path))
+        except OSError:
+            signature = None
+        cached = self._cache.get(path.name)
+        if cached is not None:
+            if cached[0] == signature:
+                self._cache.move_to_end(path.name)
+                self.cache_stats.hits += 1
+                return True, cached[1]
+            del self._cache[path.name]
+            self.cache_stats.revalidation_failures += 1
+        self.cache_stats.misses += 1
+        return signature is None, None
+
+    def _cache_store(self, path: Path, signature: tuple[int, int, int] | None, value: SupportsStr | None) -> None:
+        """Положить прочитанное значение в кеш, вытеснив самое старое при переполнении."""
+        if signature is None:
+            return
+        self._cache[path.name] = (signature, _copy_value(value))
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.cache_stats.evictions += 1
+
+    def _read_file(self, key: str, path: Path) -> tuple[SupportsStr | None, tuple[int, int, int] | None]:
+        """Прочитать и проверить файл ключа. Возвращает значение и отпечаток прочитанного файла.
+
+        Формат определяется по сигнатуре, поэтому файлы в старом JSON-формате читаются всегда.
+        """
+        try:
+            with open(path, 'rb') as f:
+                signature = _file_signature(os.fstat(f.fileno()))
+                data = f.read()
+        except OSError:
+            return None, None
+        if data.startswith(_FILE_MAGIC):
+            value = _decode_binary_file(key, data)
+        else:
+            value = _decode_json_file(key, data)
+        return (None, None) if value is None else (value, signature)
+
     @defer
     def update(self, key: SupportsStr, value: SupportsStr) -> None:
         """Обновить (или добавить) значение по ключу."""
-        self._is_directory_exists()
-        path = self._storage_directory / hashlib.sha256(str(key).encode()).hexdigest()
-        hash = hashlib.sha256()
-        hash.update(str(key).encode())
-        hash.update(str(value).encode())
-        data = {
-            "hash": str(hash.hexdigest()),
-            "value": value
-        }
-
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f)
+        self._batch.records[str(key)] = value
 
     @defer
     def delete(self, key: SupportsStr) -> None:
         """Удалить ключ вместе со значением."""
-        self._is_directory_exists()
-        path = self._storage_directory / hashlib.sha256(str(key).encode()).hexdigest()
-        path.unlink(missing_ok=True)
+        self._batch.records[str(key)] = None
 
     @defer
     def clear(self) -> None:
         """Удалить все ключи вместе со значениями."""
-        self._is_directory_exists()
-        for data in self._storage_directory.iterdir():
-            data.unlink(missing_ok=True)
+        self._batch.clear = True
+        self._batch.records.clear()
+
+    def update_many(self, mapping: Mapping[SupportsStr, SupportsStr] | Iterable[tuple[SupportsStr, SupportsStr]]) -> None:
+        """Обновить (или добавить) значения сразу для нескольких ключей одной отложенной операцией."""
+        self._update_many({str(key): value for key, value in dict(mapping).items()})
+
+    def delete_many(self, keys: Iterable[SupportsStr]) -> None:
+        """Удалить сразу несколько ключей одной отложенной операцией."""
+        self._update_many(dict.fromkeys(str(key) for key in keys))
+
+    @defer
+    def _update_many(self, records: dict[str, SupportsStr | None]) -> None:
+        """Записать в группу значения (или удаления) для нескольких ключей."""
+        self._batch.records.update(records)
 
     def commit(self) -> None:
-        """Подтвердить изменения."""
-        while self.storage_queue:
-            func, args, kwargs = self.storage_queue.pop(0)
+        """Подтвердить изменения.
+
+        Отложенные операции сворачиваются по ключам в одну группу, которая применяется целиком.
+        """
+        queue, self.storage_queue = self.storage_queue, list()
+        if not queue:
+            return
+        self._batch = _Batch()
+        for func, args, kwargs in queue:
             func(self, *args, **kwargs)
+        batch, self._batch = self._batch, _Batch()
+        self._write_batch(batch)
+
+    def _write_batch(self, batch: _Batch) -> None:
+        """Применить группу операций: одна запись в журнал и один `fsync` на транзакцию.
+
+        Файлы ключей пишутся без `fsync`: до контрольной точки их надежной копией служит журнал.
+        """
+        self._is_directory_exists()
+        files = dict()
+        for key, value in batch.records.items():
+            files[self._key_path(key).name] = None if value is None else self._encode_file(key, value)
+
+        body = bytearray((batch.clear,))
+        for name, content in files.items():
+            body += _JOURNAL_ENTRY.pack(name.encode(), content is not None, len(content or b""))
+            body += content or b""
+        record = _JOURNAL_RECORD.pack(hashlib.sha256(body).digest(), len(body)) + body
+
+        if self.multi_writer:
+            with self._writer_locks(batch.clear, files):
+                self._commit_journal(record, batch.clear, files)
+        else:
+            if self._replay_needed:
+                self._recover()
+            self._append_journal(record, batch.clear, files)
+
+        if batch.clear:
+            self._cache.clear()
+        for name in files:
+            self._cache.pop(name, None)
+
+    def _append_journal(self, record: bytes, clear: bool, files: dict[str, bytes | None]) -> None:
+        """Дописать группу в журнал, сбросить журнал на диск и применить группу.
+
+        Журнал одного писателя - журнал повторного применения: группы копятся в нем между
+        коммитами и при открытии хранилища применяются заново по порядку, что безопасно, так как
+        каждая группа целиком задает содержимое своих файлов. Журнал удаляется на контрольной
+        точке: при превышении `checkpoint_bytes`, после очистки и в `close`. Директория журнала
+        сбрасывается на диск только при создании журнала.
+        """
+        journals = self._storage_directory / _JOURNALS_NAME
+        journal = journals / _JOURNAL_NAME
+        while True:
+            try:
+                f = open(journal, 'ab')
+                break
+            except FileNotFoundError:
+                journals.mkdir(exist_ok=True)
+        with f:
+            size = f.tell()
+            try:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                # Недописанная группа в хвосте не должна заслонять следующие группы.
+                os.ftruncate(f.fileno(), size)
+                raise
+        if not size:
+            _fsync_directory(journals)
+
+        try:
+            self._apply(clear, files)
+        except BaseException:
+            self._replay_needed = True
+            raise
+        if clear or size + len(record) >= self.checkpoint_bytes:
+            self._checkpoint()
+
+    def _commit_journal(self, record: bytes, clear: bool, files: dict[str, bytes | None]) -> None:
+        """Записать журнал группы, применить группу и удалить журнал (режим нескольких писателей).
+
+        Журнал пишется под временным именем и блокируется до переименования, поэтому другие
+        процессы не примут недописанный журнал за брошенный. Журналы разных писателей нельзя
+        проиграть в порядке коммитов, поэтому здесь контрольная точка делается в каждом коммите:
+        журнал удаляется после одного `os.sync`. Опустевшая директория журналов удаляется,
+        чтобы не оставлять служебных файлов среди ключей.
+        """
+        journals = self._storage_directory / _JOURNALS_NAME
+        pending = journals / f"{_PENDING_PREFIX}{uuid4().hex}"
+        journal = journals / self._journal_name
+        while True:
+            try:
+                f = open(pending, 'wb')
+                break
+            except FileNotFoundError:
+                # Директорию журналов удаляет писатель, закончивший коммит, когда она пуста.
+                journals.mkdir(exist_ok=True)
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+            os.replace(pending, journal)
+            _fsync_directory(journals)
+
+            self._apply(clear, files)
+            os.sync()
+            journal.unlink(missing_ok=True)
+        _remove_empty_directory(journals)
+
+    def _checkpoint(self) -> None:
+        """Сбросить на диск примененные группы одним `os.sync` и удалить журнал одного писателя."""
+        if self._replay_needed:
+            self._recover()
+            return
+        journal = self._storage_directory / _JOURNALS_NAME / _JOURNAL_NAME
+        if self.multi_writer or not journal.exists():
+            return
+        os.sync()
+        journal.unlink(missing_ok=True)
+        _remove_empty_directory(journal.parent)
+
+    @contextmanager
+    def _writer_locks(self, clear: bool, files: dict[str, bytes | None]) -> Iterator[None]:
+        """Взять блокировки писателя для группы.
+
+        Общая блокировка директории берется разделяемой, а блокировки полос (первые hex-цифры
+        имени, не меньше двух) - исключительными в отсортированном порядке. Очистка берет
+        исключительную блокировку директории. Если после взятия блокировок найден журнал
+        упавшего процесса, он доприменяется под исключительной блокировкой до записи группы.
+        """
+        locks = self._storage_directory / _LOCKS_NAME
+        locks.mkdir(exist_ok=True)
+        stripes = sorted({name[:max(self.fanout, 2)] for name in files})
+        while True:
+            held = [_flock(locks / _GLOBAL_LOCK, fcntl.LOCK_EX if clear else fcntl.LOCK_SH)]
+            held.extend(_flock(locks / stripe, fcntl.LOCK_EX) for stripe in ([] if clear else stripes))
+            if clear or not self._has_orphan_journals():
+                break
+            for f in reversed(held):
+                f.close()
+            with _flock(locks / _GLOBAL_LOCK, fcntl.LOCK_EX):
+                self._recover()
+        try:
+            if clear:
+                self._recover()
+            yield
+        finally:
+            for f in reversed(held):
+                f.close()
+
+    def _encode_file(self, key: str, value: SupportsStr) -> bytes:
+        """Сериализовать файл ключа в настроенном формате."""
+        if self.record_format == "json":
+            return json.dumps(_file_record(key, value)).encode()
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value_type, payload = _VALUE_BYTES, bytes(value)
+        elif isinstance(value, str):
+            value_type, payload = _VALUE_STR, value.encode()
+        else:
+            value_type, payload = _VALUE_JSON, json.dumps(value).encode()
+        algorithm = _CHECKSUM_ALGORITHMS.index(self.checksum)
+        header = _FILE_HEADER.pack(_FILE_MAGIC, algorithm, value_type, len(payload))
+        return header + _value_checksum(algorithm, key.encode(), payload) + payload
+
+    def _apply(self, clear: bool, files: dict[str, bytes | None]) -> None:
+        """Применить записанную в журнал группу к файлам ключей.
+
+        Очистка удаляет директории шардов целиком, не перебирая файлы ключей по одному.
+        """
+        if clear:
+            for data in self._storage_directory.iterdir():
+                if data.name in (_JOURNALS_NAME, _LOCKS_NAME):
+                    continue
+                if data.is_dir() and not data.is_symlink():
+                    shutil.rmtree(data, ignore_errors=True)
+                else:
+                    data.unlink(missing_ok=True)
+        self._map(self._apply_file, files.keys(), files.values())
+
+    def _apply_file(self, name: str, content: bytes | None) -> None:
+        """Записать или удалить один файл ключа."""
+        path = _shard_path(self._storage_directory, name, self.fanout)
+        if content is None:
+            path.unlink(missing_ok=True)
+            return
+        # Несколько писателей пишут через временный файл и атомарный `os.replace`:
+        # читатель видит либо старую, либо новую запись целиком и никого не блокирует.
+        target = path.with_name(f".{name}.{uuid4().hex}") if self.multi_writer else path
+        try:
+            f = open(target, 'wb')
+        except FileNotFoundError:
+            path.parent.mkdir(exist_ok=True)
+            f = open(target, 'wb')
+        with f:
+            f.write(content)
+        if target != path:
+            os.replace(target, path)
+
+    def _journals(self, pending: bool = False) -> list[Path]:
+        """Найти журналы групп (и, по запросу, недописанные журналы) в директории-хранилище."""
+        journals = self._storage_directory / _JOURNALS_NAME
+        if not journals.is_dir():
+            return []
+        prefixes = (f"{_JOURNAL_NAME}-", _PENDING_PREFIX) if pending else (f"{_JOURNAL_NAME}-",)
+        return [
+            path for path in journals.iterdir()
+            if path.name == _JOURNAL_NAME or path.name.startswith(prefixes)
+        ]
+
+    def _has_orphan_journals(self) -> bool:
+        """Проверить, есть ли журналы, которые никто не держит: их писатель упал."""
+        for journal in self._journals():
+            try:
+                with open(journal, 'rb') as f:
+                    fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                    return True
+            except OSError:
+                continue
+        return False
+
+    def _recover(self) -> None:
+        """Применить заново группы из журналов: после открытия или прерванного коммита.
+
+        Группы применяются по порядку до первой поврежденной, затем одним `os.sync` делается
+        контрольная точка и журналы удаляются. Недописанные журналы брошенных коммитов
+        просто удаляются: их группы не подтверждены.
+        """
+        recovered = list()
+        for journal in self._journals(pending=True):
+            try:
+                f = open(journal, 'rb')
+            except OSError:
+                continue
+            with f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Журнал держит живой писатель.
+                    continue
+                if not journal.name.startswith(_PENDING_PREFIX):
+                    for group in _decode_journal(f.read()):
+                        self._apply(*group)
+                recovered.append(journal)
+        if recovered:
+            os.sync()
+        for journal in recovered:
+            journal.unlink(missing_ok=True)
+        self._replay_needed = False
+        _remove_empty_directory(self._storage_directory / _JOURNALS_NAME)
 
     def rollback(self) -> None:
         """Откатить неподтвержденные изменения."""
@@ -123,3 +706,589 @@ class StorageAdapter:
             self.rollback()
         else:
             self.commit()
+
+
+@dataclass
+class SegmentStorageAdapter(StorageAdapter):
+    """Адаптер базы данных поверх журнально-структурированного хранилища.
+
+    Записи последовательно дописываются в несколько больших сегментов, а в памяти хранится
+    индекс `хеш ключа -> (сегмент, смещение, размер)`. Устаревшие записи вычищаются фоновым
+    уплотнением. Кеш чтения (`cache_size`) здесь не поддерживается: чтение и так идет по индексу.
+    Формат и раскладка сегментов фиксированы, поэтому `record_format`, `checksum`, `fanout`
+    и `checkpoint_bytes` можно оставить только по умолчанию. Хранилище рассчитано на одного
+    владельца, `multi_writer` не поддерживается. Неподдерживаемые параметры дают `ValueError`.
+    """
+
+    segment_size: int = 64 * 1024 * 1024
+    compaction_threshold: float = 0.5
+
+    def __post_init__(self) -> None:
+        self._validate_options()
+        self.storage_queue: list[tuple] = list()
+        self._batch = _Batch()
+        self._pool: ThreadPoolExecutor | None = None
+        self._replay_needed = False
+        self.cache_stats = CacheStats()
+        self._lock = threading.RLock()
+        self._compactor: threading.Thread | None = None
+        self._active_file = None
+        self._readers: dict[int, int] = dict()
+        self._next_id = 1
+        self._load()
+
+    def _validate_options(self) -> None:
+        """Проверить параметры: поля базового хранилища, не влияющие на сегменты, должны быть по умолчанию."""
+        super()._validate_options()
+        if self.multi_writer:
+            raise ValueError("SegmentStorageAdapter не поддерживает несколько писателей")
+        for name in ("cache_size", "record_format", "checksum", "fanout", "checkpoint_bytes"):
+            if getattr(self, name) != StorageAdapter.__dataclass_fields__[name].default:
+                raise ValueError(f"SegmentStorageAdapter не поддерживает параметр {name}")
+
+    def _segment_path(self, segment_id: int) -> Path:
+        """Получить путь к сегменту по его номеру."""
+        return self._storage_directory / f"{_SEGMENT_PREFIX}{segment_id:08d}{_SEGMENT_SUFFIX}"
+
+    def _close_files(self) -> None:
+        """Закрыть все открытые дескрипторы сегментов."""
+        if self._active_file is not None:
+            self._active_file.close()
+            self._active_file = None
+        for fd in self._readers.values():
+            os.close(fd)
+        self._readers.clear()
+
+    def _load(self) -> None:
+        """Перечитать сегменты с диска и восстановить индекс."""
+        self._close_files()
+        self._stale = False
+        self._index: dict[bytes, tuple[int, int, int]] = dict()
+        self._segments: dict[int, int] = dict()
+        # Байты живых записей по сегментам.
+        self._live: dict[int, int] = dict()
+        self._active_id = 0
+        if not self._storage_directory.is_dir() or self._storage_directory.is_symlink():
+            return
+
+        segment_ids = []
+        for path in self._storage_directory.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"):
+            try:
+                segment_ids.append(int(path.name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]))
+            except ValueError:
+                continue
+        segment_ids.sort()
+
+        for segment_id in segment_ids:
+            path = self._segment_path(segment_id)
+            end = self._replay(segment_id, path)
+            if segment_id == segment_ids[-1] and end < path.stat().st_size:
+                # Оборванный хвост последнего сегмента: отрезаем, чтобы дописывать после валидных записей.
+                os.truncate(path, end)
+            self._segments[segment_id] = end
+        if segment_ids:
+            self._active_id = segment_ids[-1]
+            self._next_id = max(self._next_id, self._active_id + 1)
+
+    def _replay(self, segment_id: int, path: Path) -> int:
+        """Проиграть записи сегмента в индекс.
+
+        Записи группы попадают в индекс только после ее маркера коммита. Возвращает смещение
+        конца последней подтвержденной группы.
+        """
+        size = path.stat().st_size
+        offset = committed = 0
+        staged: list[tuple[bytes, tuple[int, int, int] | None]] = list()
+        with open(path, "rb") as f:
+            while offset + _RECORD_HEADER.size <= size:
+                header = f.read(_RECORD_HEADER.size)
+                digest, checksum, op, length = _RECORD_HEADER.unpack(header)
+                record_size = _RECORD_HEADER.size + length
+                if op not in (_OP_PUT, _OP_DELETE, _OP_COMMIT) or offset + record_size > size:
+                    break
+                if op == _OP_PUT:
+                    f.seek(length, os.SEEK_CUR)
+                    staged.append((digest, (segment_id, offset, record_size)))
+                else:
+                    payload = f.read(length)
+                    if checksum != _record_checksum(op, digest, payload):
+                        break
+                    if op == _OP_DELETE:
+                        staged.append((digest, None))
+                    else:
+                        if payload == b"clear":
+                            self._index.clear()
+                            self._live.clear()
+                        self._apply_staged(staged)
+                        staged.clear()
+                        committed = offset + record_size
+                offset += record_size
+        return committed
+
+    def _apply_staged(self, staged: list[tuple[bytes, tuple[int, int, int] | None]]) -> None:
+        """Перенести подтвержденные записи группы в индекс."""
+        for digest, entry in staged:
+            if entry is None:
+                self._index_delete(digest)
+            else:
+                self._index_put(digest, entry)
+
+    def _index_put(self, digest: bytes, entry: tuple[int, int, int]) -> None:
+        """Указать в индексе новое расположение записи."""
+        previous = self._index.get(digest)
+        if previous is not None:
+            self._live[previous[0]] -= previous[2]
+        self._index[digest] = entry
+        self._live[entry[0]] = self._live.get(entry[0], 0) + entry[2]
+
+    def _index_delete(self, digest: bytes) -> None:
+        """Удалить ключ из индекса."""
+        previous = self._index.pop(digest, None)
+        if previous is not None:
+            self._live[previous[0]] -= previous[2]
+
+    def _reader(self, segment_id: int) -> int | None:
+        """Получить дескриптор сегмента для чтения, если сегмент еще существует."""
+        fd = self._readers.get(segment_id)
+        if fd is None:
+            try:
+                fd = os.open(self._segment_path(segment_id), os.O_RDONLY)
+            except OSError:
+                return None
+            self._readers[segment_id] = fd
+        if os.fstat(fd).st_nlink == 0:
+            # Сегмент удалили или подменили извне: индекс больше не соответствует диску.
+            self._stale = True
+            return None
+        return fd
+
+    def _read_record(self, entry: tuple[int, int, int]) -> bytes | None:
+        """Прочитать запись целиком по ее расположению."""
+        return self._pread_record(entry, {entry[0]: self._reader(entry[0])})
+
+    def _ensure_active(self, new_segment: bool = False) -> None:
+        """Открыть активный сегмент для дозаписи, при переполнении начать новый.
+
+        Вызывается только на границе групп, поэтому группа целиком лежит в одном сегменте.
+        """
+        full = self._active_id == 0 or self._segments[self._active_id] >= self.segment_size
+        if self._active_file is not None and not full and not new_segment:
+            return
+        if self._active_file is not None:
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+            self._active_file.close()
+            self._active_file = None
+        if full or new_segment:
+            # Номера сегментов не переиспользуются, даже после `clear`.
+            self._active_id = self._next_id
+            self._next_id += 1
+            self._segments[self._active_id] = 0
+        self._active_file = open(self._segment_path(self._active_id), "ab")
+
+    def _append(self, record: bytes) -> tuple[int, int, int]:
+        """Дописать запись в активный сегмент."""
+        entry = (self._active_id, self._segments[self._active_id], len(record))
+        self._active_file.write(record)
+        self._segments[self._active_id] += len(record)
+        return entry
+
+    def _flush(self, sync: bool = False) -> None:
+        """Сбросить буфер активного сегмента на диск."""
+        if self._active_file is not None:
+            self._active_file.flush()
+            if sync:
+                os.fsync(self._active_file.fileno())
+
+    def _check_consistency(self) -> None:
+        """Перечитать хранилище, если директорию или активный сегмент изменили извне."""
+        if self._stale or not self._storage_directory.is_dir() or self._storage_directory.is_symlink():
+            self._load()
+        elif self._active_file is not None and os.fstat(self._active_file.fileno()).st_nlink == 0:
+            self._load()
+        self._is_directory_exists()
+
+    def get(self, key: SupportsStr) -> str | None:
+        """Получить объект, если он существует."""
+        digest = hashlib.sha256(str(key).encode()).digest()
+        with self._lock:
+            entry = self._index.get(digest)
+            if entry is None:
+                return None
+            record = self._read_record(entry)
+            if self._stale:
+                self._load()
+        return _decode_record(digest, record)
+
+    def get_many(self, keys: Iterable[SupportsStr]) -> list[str | None]:
+        """Получить значения сразу для нескольких ключей в порядке ключей.
+
+        Записи читаются через `pread` параллельно в пуле потоков.
+        """
+        digests = [hashlib.sha256(str(key).encode()).digest() for key in keys]
+        with self._lock:
+            entries = [self._index.get(digest) for digest in digests]
+            # Дескрипторы открываются заранее, чтобы потоки не меняли словарь читателей.
+            fds = {entry[0]: self._reader(entry[0]) for entry in entries if entry is not None}
+            records = self._map(self._pread_record, entries, [fds] * len(entries))
+            if self._stale:
+                self._load()
+        return [_decode_record(digest, record) for digest, record in zip(digests, records)]
+
+    def get_view(self, key: SupportsStr) -> ValueView | None:
+        """Получить значение как буфер.
+
+        Записи сегментов хранят значение в JSON, поэтому буфер строится из прочитанного значения.
+        """
+        value = self.get(key)
+        return None if value is None else ValueView.from_value(value)
+
+    @staticmethod
+    def _pread_record(entry: tuple[int, int, int] | None, fds: dict[int, int | None]) -> bytes | None:
+        """Прочитать запись по заранее открытому дескриптору."""
+        if entry is None or fds[entry[0]] is None:
+            return None
+        segment_id, offset, size = entry
+        record = os.pread(fds[segment_id], size, offset)
+        return record if len(record) == size else None
+
+    def _write_batch(self, batch: _Batch) -> None:
+        """Дописать группу одним куском с маркером коммита и одним `fsync`.
+
+        Маркер коммита служит единственной журнальной записью группы: при восстановлении
+        группа без маркера отбрасывается целиком.
+        """
+        with self._lock:
+            self._check_consistency()
+            self._ensure_active(new_segment=batch.clear)
+            staged: list[tuple[bytes, tuple[int, int, int] | None]] = list()
+            for key, value in batch.records.items():
+                digest = hashlib.sha256(key.encode()).digest()
+                if value is not None:
+                    payload = json.dumps(value).encode()
+                    staged.append((digest, self._append(_pack_record(_OP_PUT, digest, payload))))
+                elif not batch.clear and digest in self._index:
+                    self._append(_pack_record(_OP_DELETE, digest, b""))
+                    staged.append((digest, None))
+            self._append(_pack_record(_OP_COMMIT, bytes(32), b"clear" if batch.clear else b""))
+            self._flush(sync=True)
+
+            if batch.clear:
+                # Старые сегменты удаляются только после того, как маркер очистки попал на диск.
+                for segment_id in [s for s in self._segments if s != self._active_id]:
+                    self._drop_segment(segment_id)
+                self._index.clear()
+                self._live.clear()
+            self._apply_staged(staged)
+
+        if self._garbage_ratio() > self.compaction_threshold:
+            self.compact(wait=False)
+
+    def _drop_segment(self, segment_id: int) -> None:
+        """Закрыть и удалить сегмент."""
+        fd = self._readers.pop(segment_id, None)
+        if fd is not None:
+            os.close(fd)
+        self._segment_path(segment_id).unlink(missing_ok=True)
+        del self._segments[segment_id]
+        self._live.pop(segment_id, None)
+
+    def _garbage_ratio(self) -> float:
+        """Доля байтов закрытых сегментов, занятых устаревшими записями.
+
+        Активный сегмент не учитывается: уплотнение его не трогает, и без закрытых сегментов
+        доля равна нулю.
+        """
+        sealed = [s for s in self._segments if s != self._active_id]
+        total = sum(self._segments[s] for s in sealed)
+        live = sum(self._live.get(s, 0) for s in sealed)
+        return 1 - live / total if total else 0.0
+
+    def compact(self, wait: bool = True) -> None:
+        """Уплотнить закрытые сегменты в фоновом потоке."""
+        with self._lock:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=self._compact, daemon=True)
+                self._compactor.start()
+            compactor = self._compactor
+        if wait:
+            compactor.join()
+
+    def _compact(self) -> None:
+        """Перенести живые записи закрытых сегментов в активный и удалить закрытые сегменты.
+
+        Сегменты обрабатываются от старых к новым, поэтому надгробия можно не переносить:
+        перекрываемые ими записи лежат в уже удаленных сегментах.
+        """
+        with self._lock:
+            sealed = sorted(s for s in self._segments if s != self._active_id)
+            live: dict[int, list[tuple[bytes, tuple[int, int, int]]]] = {s: [] for s in sealed}
+            for digest, entry in self._index.items():
+                if entry[0] in live:
+                    live[entry[0]].append((digest, entry))
+
+        for segment_id in sealed:
+            with self._lock:
+                if segment_id not in self._segments:
+                    continue
+                self._ensure_active()
+                staged: list[tuple[bytes, tuple[int, int, int] | None]] = list()
+                for digest, entry in live[segment_id]:
+                    if self._index.get(digest) != entry:
+                        continue
+                    record = self._read_record(entry)
+                    if record is None:
+                        staged.append((digest, None))
+                    else:
+                        staged.append((digest, self._append(record)))
+                self._append(_pack_record(_OP_COMMIT, bytes(32), b""))
+                self._flush(sync=True)
+                self._apply_staged(staged)
+                self._drop_segment(segment_id)
+                if self._stale:
+                    self._load()
+                    return
+
+    def close(self) -> None:
+        """Дождаться уплотнения, закрыть файлы сегментов и остановить пул потоков."""
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            self._flush(sync=True)
+            self._close_files()
+        super().close()
+
+
+def _flock(path: Path, operation: int) -> BinaryIO:
+    """Открыть файл блокировки и взять на нем `flock`. Блокировка снимается закрытием файла."""
+    f = open(path, 'a+b')
+    try:
+        fcntl.flock(f, operation)
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def _fsync_directory(path: Path) -> None:
+    """Сбросить на диск записи директории: созданные, переименованные и удаленные файлы."""
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    except FileNotFoundError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _remove_empty_directory(path: Path) -> None:
+    """Удалить директорию, если она пуста; занятую или уже удаленную оставить как есть."""
+    with suppress(OSError):
+        path.rmdir()
+
+
+def _shard_path(directory: Path, name: str, fanout: int) -> Path:
+    """Путь к файлу ключа: при `fanout > 0` файл лежит в поддиректории из первых hex-цифр имени."""
+    if fanout:
+        return directory / name[:fanout] / name
+    return directory / name
+
+
+def _is_key_name(name: str) -> bool:
+    """Проверить, что имя похоже на имя файла ключа (hex-дайджест SHA-256)."""
+    return len(name) == 64 and all(char in string.hexdigits for char in name)
+
+
+def _copy_value(value: SupportsStr | None) -> SupportsStr | None:
+    """Копия изменяемого значения (списка или словаря из JSON) для кеша чтения."""
+    if value is None or isinstance(value, (str, bytes, int, float)):
+        return value
+    return copy.deepcopy(value)
+
+
+def _file_signature(stat: os.stat_result) -> tuple[int, int, int]:
+    """Отпечаток файла для дешевой перепроверки кеша."""
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _decode_journal(data: bytes) -> list[tuple[bool, dict[str, bytes | None]]]:
+    """Разобрать группы журнала по порядку.
+
+    Разбор останавливается на первой поврежденной или оборванной группе.
+    """
+    groups = list()
+    view = memoryview(data)
+    position = 0
+    while position + _JOURNAL_RECORD.size <= len(view):
+        checksum, size = _JOURNAL_RECORD.unpack_from(view, position)
+        position += _JOURNAL_RECORD.size
+        body = view[position:position + size]
+        position += size
+        if not body or len(body) != size or checksum != hashlib.sha256(body).digest():
+            break
+        files: dict[str, bytes | None] = dict()
+        offset = 1
+        while offset < len(body):
+            name, present, length = _JOURNAL_ENTRY.unpack_from(body, offset)
+            offset += _JOURNAL_ENTRY.size
+            files[name.decode()] = bytes(body[offset:offset + length]) if present else None
+            offset += length
+        groups.append((bool(body[0]), files))
+    return groups
+
+
+def _decode_json_file(key: str, data: bytes) -> SupportsStr | None:
+    """Проверить файл ключа в JSON-формате и достать из него значение."""
+    try:
+        record = json.loads(data)
+        hash = hashlib.sha256()
+        hash.update(key.encode())
+        hash.update(str(record["value"]).encode())
+        if record["hash"] == str(hash.hexdigest()):
+            return record["value"]
+    except (ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _decode_binary_file(key: str, data: bytes) -> SupportsStr | None:
+    """Проверить файл ключа в бинарном формате и достать из него значение."""
+    if len(data) < _FILE_HEADER.size:
+        return None
+    _, algorithm, value_type, length = _FILE_HEADER.unpack_from(data)
+    if algorithm >= len(_CHECKSUM_ALGORITHMS) or value_type not in (_VALUE_STR, _VALUE_BYTES, _VALUE_JSON):
+        return None
+    start = _FILE_HEADER.size + _CHECKSUM_SIZES[algorithm]
+    payload = data[start:]
+    if len(payload) != length:
+        return None
+    if data[_FILE_HEADER.size:start] != _value_checksum(algorithm, key.encode(), payload):
+        return None
+    if value_type == _VALUE_BYTES:
+        return payload
+    try:
+        return payload.decode() if value_type == _VALUE_STR else json.loads(payload)
+    except ValueError:
+        return None
+
+
+class _Crc32:
+    """CRC32 с интерфейсом `hashlib`: `update` и `digest`."""
+
+    def __init__(self, data: bytes = b"") -> None:
+        self._value = zlib.crc32(data)
+
+    def update(self, data: bytes) -> None:
+        self._value = zlib.crc32(data, self._value)
+
+    def digest(self) -> bytes:
+        return self._value.to_bytes(4, "little")
+
+
+def _checksum_hasher(algorithm: int, key: bytes):
+    """Инкрементальный подсчет контрольной суммы бинарного файла ключа, начиная с ключа."""
+    if _CHECKSUM_ALGORITHMS[algorithm] == "crc32":
+        return _Crc32(key)
+    return hashlib.sha256(key)
+
+
+def _value_checksum(algorithm: int, key: bytes, payload: bytes) -> bytes:
+    """Контрольная сумма бинарного файла ключа: связывает ключ и значение."""
+    hasher = _checksum_hasher(algorithm, key)
+    hasher.update(payload)
+    return hasher.digest()
+
+
+def _file_record(key: str, value: SupportsStr) -> dict:
+    """Содержимое файла ключа: значение и хеш от ключа и значения."""
+    hash = hashlib.sha256()
+    hash.update(key.encode())
+    hash.update(str(value).encode())
+    return {
+        "hash": str(hash.hexdigest()),
+        "value": value
+    }
+
+
+def _decode_record(digest: bytes, record: bytes | None) -> SupportsStr | None:
+    """Проверить запись сегмента и достать из нее значение."""
+    if record is None:
+        return None
+    stored_digest, checksum, op, _ = _RECORD_HEADER.unpack_from(record)
+    payload = record[_RECORD_HEADER.size:]
+    if stored_digest != digest or op != _OP_PUT:
+        return None
+    if checksum != _record_checksum(op, digest, payload):
+        return None
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def _record_checksum(op: int, digest: bytes, payload: bytes) -> bytes:
+    """Контрольная сумма записи сегмента: связывает тип операции, ключ и значение."""
+    checksum = hashlib.sha256(bytes((op,)))
+    checksum.update(digest)
+    checksum.update(payload)
+    return checksum.digest()
+
+
+def _pack_record(op: int, digest: bytes, payload: bytes) -> bytes:
+    """Сериализовать запись сегмента."""
+    header = _RECORD_HEADER.pack(digest, _record_checksum(op, digest, payload), op, len(payload))
+    return header + payload
+
+
+def migrate_layout(directory: Path, fanout: int) -> int:
+    """Перенести файлы ключей хранилища на месте в раскладку с заданным `fanout`.
+
+    `fanout=0` возвращает хранилище к плоской раскладке. Файлы переносятся через `os.replace`,
+    опустевшие директории шардов удаляются, прерванный коммит доприменяется уже в новой
+    раскладке. Служебные директории журналов и блокировок не трогаются. Возвращает число
+    перенесенных файлов.
+    """
+    shards = [
+        path for path in directory.iterdir()
+        if path.is_dir() and not path.is_symlink() and path.name not in (_JOURNALS_NAME, _LOCKS_NAME)
+    ]
+    sources = [path for path in directory.iterdir() if path.is_file() and _is_key_name(path.name)]
+    for shard in shards:
+        sources.extend(
+            path for path in shard.iterdir() if _is_key_name(path.name) and path.name.startswith(shard.name)
+        )
+
+    moved = 0
+    for source in sources:
+        target = _shard_path(directory, source.name, fanout)
+        if source == target:
+            continue
+        target.parent.mkdir(exist_ok=True)
+        os.replace(source, target)
+        moved += 1
+    for shard in shards:
+        with suppress(OSError):
+            shard.rmdir()
+
+    StorageAdapter(_storage_directory=directory, fanout=fanout)
+    return moved
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Запустить миграцию раскладки хранилища из командной строки."""
+    parser = ArgumentParser(prog="database")
+    parser.add_argument("directory", type=Path, help="Директория-хранилище")
+    parser.add_argument(
+        "-f", "--fanout",
+        type=int,
+        default=0,
+        help="Число hex-цифр в имени директории-шарда, 0 - плоская раскладка"
+    )
+    args = parser.parse_args(argv)
+    moved = migrate_layout(args.directory, args.fanout)
+    print(f"Перенесено файлов: {moved}")
+
+
+if __name__ == "__main__":
+    main()
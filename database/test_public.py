@@ -1,15 +1,20 @@
+import fcntl
 import hashlib
+import json
 import os
 import shutil
+import struct
+import threading
 
 from contextlib import suppress
+from multiprocessing import get_context
 from pathlib import Path
 from tempfile import gettempdir
 from uuid import uuid4
 
 import pytest
 
-from database import StorageAdapter
+from database import IntegrityError, SegmentStorageAdapter, StorageAdapter, migrate_layout
 
 
 KEY: str = "key"
@@ -39,6 +44,11 @@ def adapter(sandbox: Path) -> StorageAdapter:
     return StorageAdapter(_storage_directory=sandbox)
 
 
+@pytest.fixture(scope="function")
+def segment_adapter(sandbox: Path) -> SegmentStorageAdapter:
+    return SegmentStorageAdapter(_storage_directory=sandbox, segment_size=1024)
+
+
 def test__read_write(adapter: StorageAdapter) -> None:  # 1
     """Тест цикла 'запись - чтение'."""
     adapter.update(KEY, VALUE)
@@ -632,3 +642,578 @@ def test__algorithm__shared_clear(sandbox: Path) -> None:  # 47
 
     assert value is None
     assert another_value is None
+
+
+def test__segment__read_write(segment_adapter: SegmentStorageAdapter) -> None:
+    """Журнальное хранилище: цикл 'запись - чтение' и транзакции."""
+    segment_adapter.update(KEY, VALUE)
+    assert segment_adapter.get(KEY) is None
+
+    segment_adapter.commit()
+    assert segment_adapter.get(KEY) == VALUE
+
+    with suppress(OSError), segment_adapter:
+        segment_adapter.delete(KEY)
+        raise OSError("Hello, HSE")
+
+    assert segment_adapter.get(KEY) == VALUE
+
+
+def test__segment__reopen(sandbox: Path, segment_adapter: SegmentStorageAdapter) -> None:
+    """Журнальное хранилище: индекс восстанавливается из сегментов."""
+    with segment_adapter:
+        segment_adapter.update(KEY, VALUE)
+        segment_adapter.update(ANOTHER_KEY, ANOTHER_VALUE)
+        segment_adapter.delete(ANOTHER_KEY)
+    segment_adapter.close()
+
+    reopened = SegmentStorageAdapter(_storage_directory=sandbox)
+
+    assert reopened.get(KEY) == VALUE
+    assert reopened.get(ANOTHER_KEY) is None
+
+
+def test__segment__few_files(sandbox: Path, segment_adapter: SegmentStorageAdapter) -> None:
+    """Журнальное хранилище: число файлов не растет вместе с числом ключей."""
+    with segment_adapter:
+        for index in range(100):
+            segment_adapter.update(f"{KEY}_{index}", VALUE)
+
+    assert len(list(sandbox.iterdir())) < 100
+
+    with segment_adapter:
+        segment_adapter.clear()
+
+    assert len(list(sandbox.iterdir())) == 1
+    assert segment_adapter.get(f"{KEY}_0") is None
+
+
+def test__segment__compaction(sandbox: Path, segment_adapter: SegmentStorageAdapter) -> None:
+    """Журнальное хранилище: уплотнение удаляет устаревшие записи."""
+    for _ in range(20):
+        with segment_adapter:
+            segment_adapter.update(KEY, VALUE)
+            segment_adapter.update(ANOTHER_KEY, ANOTHER_VALUE)
+
+    segment_adapter.compact()
+
+    assert len(list(sandbox.iterdir())) == 1
+    assert segment_adapter.get(KEY) == VALUE
+    assert segment_adapter.get(ANOTHER_KEY) == ANOTHER_VALUE
+
+
+def test__segment__no_compaction_in_active(sandbox: Path) -> None:
+    """Журнальное хранилище: мусор в активном сегменте не запускает уплотнение."""
+    adapter = SegmentStorageAdapter(_storage_directory=sandbox)
+    for _ in range(50):
+        with adapter:
+            adapter.update(KEY, VALUE)
+
+    assert len(list(sandbox.iterdir())) == 1
+    assert adapter._compactor is None
+    assert adapter.get(KEY) == VALUE
+    adapter.close()
+
+
+@pytest.mark.parametrize("option", [
+    {"cache_size": 16},
+    {"record_format": "binary"},
+    {"checksum": "crc32"},
+    {"fanout": 2},
+    {"multi_writer": True},
+    {"checkpoint_bytes": 1024},
+    {"checksum": "md4"},
+])
+def test__segment__unsupported_options(sandbox: Path, option: dict) -> None:
+    """Журнальное хранилище: неподдерживаемые параметры отклоняются, а не игнорируются."""
+    with pytest.raises(ValueError):
+        SegmentStorageAdapter(_storage_directory=sandbox, **option)
+
+
+def test__segment__cache_stats(segment_adapter: SegmentStorageAdapter) -> None:
+    """Журнальное хранилище: статистика кеша есть, но кеш не используется."""
+    with segment_adapter:
+        segment_adapter.update(KEY, VALUE)
+    segment_adapter.get(KEY)
+
+    assert segment_adapter.cache_stats.hits == 0
+
+
+def test__segment__virus(sandbox: Path, segment_adapter: SegmentStorageAdapter) -> None:
+    """Журнальное хранилище: вирус испортил сегмент или удалил директорию."""
+    with segment_adapter:
+        segment_adapter.update(KEY, VALUE)
+
+    segment = next(sandbox.iterdir())
+    segment.write_bytes(segment.read_bytes().replace(VALUE.encode(), b"virus"))
+
+    assert segment_adapter.get(KEY) is None
+
+    shutil.rmtree(sandbox)
+
+    assert segment_adapter.get(KEY) is None
+
+    with segment_adapter:
+        segment_adapter.update(KEY, VALUE)
+
+    assert segment_adapter.get(KEY) == VALUE
+
+
+def test__commit__coalesce(sandbox: Path, adapter: StorageAdapter) -> None:
+    """Операции транзакции сворачиваются по ключам, журнал удаляется на контрольной точке."""
+    for index in range(1000):
+        adapter.update(KEY, f"{VALUE}_{index}")
+        adapter.update(f"{ANOTHER_KEY}_{index}", ANOTHER_VALUE)
+        adapter.delete(f"{ANOTHER_KEY}_{index}")
+    adapter.commit()
+
+    assert adapter.storage_queue == []
+    assert adapter.get(KEY) == f"{VALUE}_999"
+
+    adapter.close()
+
+    assert [file.name for file in sandbox.iterdir()] == [KEY_FILENAME]
+
+
+def _journal_record(content: bytes) -> bytes:
+    """Группа журнала, которая записывает файл ключа KEY."""
+    body = b"\x00" + struct.pack("<64sBQ", KEY_FILENAME.encode(), 1, len(content)) + content
+    return hashlib.sha256(body).digest() + struct.pack("<Q", len(body)) + body
+
+
+def test__commit__recover_journal(sandbox: Path, adapter: StorageAdapter) -> None:
+    """Прерванный коммит доприменяется из журнала."""
+    with adapter:
+        adapter.update(KEY, VALUE)
+
+    content = (sandbox / KEY_FILENAME).read_bytes()
+    (sandbox / KEY_FILENAME).unlink()
+    (sandbox / ".journals").mkdir(exist_ok=True)
+    (sandbox / ".journals" / "journal").write_bytes(_journal_record(content))
+
+    recovered = StorageAdapter(_storage_directory=sandbox)
+
+    assert recovered.get(KEY) == VALUE
+    assert not (sandbox / ".journals").exists()
+
+
+def test__commit__single_fsync(sandbox: Path, adapter: StorageAdapter, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Коммит сбрасывает на диск только журнал, файлы ключей сбрасываются на контрольной точке."""
+    with adapter:
+        adapter.update(KEY, VALUE)
+
+    fsyncs, syncs = list(), list()
+    fsync, sync = os.fsync, os.sync
+
+    def recording_fsync(fd: int) -> None:
+        fsyncs.append(os.readlink(f"/proc/self/fd/{fd}"))
+        fsync(fd)
+
+    def recording_sync() -> None:
+        syncs.append((sandbox / ".journals" / "journal").exists())
+        sync()
+
+    monkeypatch.setattr(os, "fsync", recording_fsync)
+    monkeypatch.setattr(os, "sync", recording_sync)
+    with adapter:
+        adapter.update_many((f"{KEY}_{index}", VALUE) for index in range(1000))
+
+    assert fsyncs == [os.path.join(os.path.realpath(sandbox), ".journals", "journal")]
+    assert syncs == []
+
+    adapter.close()
+
+    assert syncs == [True], "Журнал должен удаляться только после сброса файлов на диск"
+    assert not (sandbox / ".journals").exists()
+
+
+def test__commit__checkpoint_size(sandbox: Path) -> None:
+    """Журнал удаляется, когда его размер превышает порог контрольной точки."""
+    adapter = StorageAdapter(_storage_directory=sandbox, checkpoint_bytes=1024)
+    with adapter:
+        adapter.update(KEY, VALUE)
+
+    assert (sandbox / ".journals" / "journal").exists()
+
+    with adapter:
+        adapter.update(ANOTHER_KEY, "x" * 1024)
+
+    assert not (sandbox / ".journals").exists()
+    assert adapter.get(ANOTHER_KEY) == "x" * 1024
+
+
+def test__commit__replay_log(sandbox: Path, adapter: StorageAdapter) -> None:
+    """Журнал проигрывается при открытии по порядку групп до первой поврежденной."""
+    for value in (VALUE, ANOTHER_VALUE):
+        with adapter:
+            adapter.update(KEY, value)
+    with adapter:
+        adapter.delete(ANOTHER_KEY)
+    journal = sandbox / ".journals" / "journal"
+    data = journal.read_bytes()
+    (sandbox / KEY_FILENAME).unlink()
+    journal.write_bytes(data + data[:10])
+
+    recovered = StorageAdapter(_storage_directory=sandbox)
+
+    assert recovered.get(KEY) == ANOTHER_VALUE
+    assert not (sandbox / ".journals").exists()
+
+
+def test__commit__interrupted_apply(sandbox: Path, adapter: StorageAdapter, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Применение, прерванное после переименования журнала, доприменяется при открытии."""
+    with adapter:
+        adapter.update(KEY, VALUE)
+
+    apply_file = StorageAdapter._apply_file
+
+    def crashing_apply_file(self: StorageAdapter, name: str, content: bytes | None) -> None:
+        if name != KEY_FILENAME:
+            raise OSError("Hello, HSE")
+        apply_file(self, name, content)
+
+    monkeypatch.setattr(StorageAdapter, "_apply_file", crashing_apply_file)
+    with pytest.raises(OSError), adapter:
+        adapter.update(KEY, ANOTHER_VALUE)
+        adapter.update(ANOTHER_KEY, ANOTHER_VALUE)
+    monkeypatch.undo()
+
+    assert (sandbox / ".journals" / "journal").exists()
+
+    recovered = StorageAdapter(_storage_directory=sandbox)
+
+    assert recovered.get(KEY) == ANOTHER_VALUE
+    assert recovered.get(ANOTHER_KEY) == ANOTHER_VALUE
+
+
+def test__segment__torn_batch(sandbox: Path, segment_adapter: SegmentStorageAdapter) -> None:
+    """Журнальное хранилище: группа без маркера коммита отбрасывается целиком."""
+    with segment_adapter:
+        segment_adapter.update(KEY, VALUE)
+    with segment_adapter:
+        segment_adapter.update(KEY, ANOTHER_VALUE)
+        segment_adapter.update(ANOTHER_KEY, ANOTHER_VALUE)
+    segment_adapter.close()
+
+    segment = next(sandbox.iterdir())
+    segment.write_bytes(segment.read_bytes()[:-1])
+
+    reopened = SegmentStorageAdapter(_storage_directory=sandbox)
+
+    assert reopened.get(KEY) == VALUE
+    assert reopened.get(ANOTHER_KEY) is None
+
+
+def test__cache__hits_and_invalidation(sandbox: Path) -> None:
+    """Кеш чтения: попадания, вытеснение и сброс при коммите."""
+    adapter = StorageAdapter(_storage_directory=sandbox, cache_size=1)
+    with adapter:
+        adapter.update(KEY, VALUE)
+        adapter.update(ANOTHER_KEY, ANOTHER_VALUE)
+
+    assert adapter.get(KEY) == VALUE
+    assert adapter.get(KEY) == VALUE
+    assert adapter.get(ANOTHER_KEY) == ANOTHER_VALUE
+
+    with adapter:
+        adapter.update(ANOTHER_KEY, VALUE)
+
+    assert adapter.get(ANOTHER_KEY) == VALUE
+    assert adapter.cache_stats.hits == 1
+    assert adapter.cache_stats.misses == 3
+    assert adapter.cache_stats.evictions == 1
+
+
+def test__cache__virus(sandbox: Path) -> None:
+    """Кеш чтения: подмена файла извне обнаруживается при перепроверке."""
+    adapter = StorageAdapter(_storage_directory=sandbox, cache_size=16)
+    with adapter:
+        adapter.update(KEY, VALUE)
+
+    assert adapter.get(KEY) == VALUE
+
+    file = sandbox / KEY_FILENAME
+    file.write_text("Hello, HSE")
+
+    assert adapter.get(KEY) is None
+    assert adapter.cache_stats.revalidation_failures == 1
+
+    shutil.rmtree(sandbox)
+
+    assert adapter.get(KEY) is None
+
+
+def test__cache__copy_and_symlink(sandbox: Path) -> None:
+    """Кеш чтения: изменение результата не портит кеш, подмена директории ссылкой проверяется."""
+    adapter = StorageAdapter(_storage_directory=sandbox, cache_size=16)
+    with adapter:
+        adapter.update(KEY, [VALUE])
+
+    adapter.get(KEY).append(ANOTHER_VALUE)
+    adapter.get_many([KEY])[0].append(ANOTHER_VALUE)
+
+    assert adapter.get(KEY) == [VALUE]
+
+    target = sandbox.with_name(f"{sandbox.name}-target")
+    target.mkdir()
+    shutil.rmtree(sandbox)
+    sandbox.symlink_to(target)
+
+    assert adapter.get(KEY) is None
+    assert sandbox.is_dir() and not sandbox.is_symlink()
+
+
+@pytest.mark.parametrize(("adapter_type", "cache_size"), [
+    (StorageAdapter, 0),
+    (StorageAdapter, 8),
+    (SegmentStorageAdapter, 0),
+])
+def test__batch__many(sandbox: Path, adapter_type: type[StorageAdapter], cache_size: int) -> None:
+    """Пакетные методы: транзакционность и порядок результатов."""
+    adapter = adapter_type(_storage_directory=sandbox, cache_size=cache_size, max_workers=4)
+    keys = [f"{KEY}_{index}" for index in range(100)]
+
+    adapter.update_many({key: f"{VALUE}_{key}" for key in keys})
+    assert adapter.get_many(keys) == [None] * len(keys)
+
+    adapter.commit()
+    assert adapter.get_many(keys) == [f"{VALUE}_{key}" for key in keys]
+
+    adapter.delete_many(keys[::2])
+    adapter.rollback()
+    adapter.delete_many(keys[1::2])
+    adapter.update(keys[1], VALUE)
+    adapter.commit()
+
+    expected = [f"{VALUE}_{key}" if index % 2 == 0 else None for index, key in enumerate(keys)]
+    expected[1] = VALUE
+    assert adapter.get_many(keys) == expected
+    assert adapter.get_many([ANOTHER_KEY]) == [None]
+
+    pool = adapter._pool
+    assert pool is not None
+    adapter.get_many(keys)
+    assert adapter._pool is pool, "Пул потоков пересоздается на каждый вызов"
+    adapter.close()
+    assert adapter._pool is None
+
+
+@pytest.mark.parametrize("checksum", ["sha256", "crc32"])
+def test__format__binary(sandbox: Path, checksum: str) -> None:
+    """Бинарный формат: значения, байты и подмена файла."""
+    adapter = StorageAdapter(_storage_directory=sandbox, record_format="binary", checksum=checksum)
+    with adapter:
+        adapter.update(KEY, VALUE)
+        adapter.update(ANOTHER_KEY, b"\x00\xff")
+
+    assert adapter.get(KEY) == VALUE
+    assert adapter.get(ANOTHER_KEY) == b"\x00\xff"
+
+    with adapter:
+        adapter.update(f"{KEY}_int", 42)
+        adapter.update(f"{KEY}_list", [VALUE, 1, None])
+
+    assert adapter.get(f"{KEY}_int") == 42
+    assert adapter.get(f"{KEY}_list") == [VALUE, 1, None]
+    assert bytes(adapter.get_view(f"{KEY}_int").buffer) == b"42"
+
+    file = sandbox / KEY_FILENAME
+    file.write_bytes(file.read_bytes().replace(VALUE.encode(), b"virus"))
+
+    assert adapter.get(KEY) is None
+
+
+def test__format__json_migration(sandbox: Path) -> None:
+    """Файлы в JSON-формате читаются адаптером с бинарным форматом."""
+    with StorageAdapter(_storage_directory=sandbox) as adapter:
+        adapter.update(KEY, VALUE)
+
+    binary = StorageAdapter(_storage_directory=sandbox, record_format="binary", checksum="crc32")
+
+    assert json.loads((sandbox / KEY_FILENAME).read_text())["value"] == VALUE
+    assert binary.get(KEY) == VALUE
+
+    with binary:
+        binary.update(KEY, ANOTHER_VALUE)
+
+    assert binary.get(KEY) == ANOTHER_VALUE
+    assert (sandbox / KEY_FILENAME).read_bytes().startswith(b"KVS")
+
+
+def test__fanout__layout(sandbox: Path) -> None:
+    """Раскладка по шардам: файл ключа лежит в поддиректории, очистка удаляет шарды."""
+    adapter = StorageAdapter(_storage_directory=sandbox, fanout=2)
+    with adapter:
+        adapter.update(KEY, VALUE)
+
+    assert (sandbox / KEY_FILENAME[:2] / KEY_FILENAME).is_file()
+    assert adapter.get(KEY) == VALUE
+
+    with adapter:
+        adapter.clear()
+
+    assert list(sandbox.iterdir()) == []
+    assert adapter.get(KEY) is None
+
+
+def test__fanout__migrate(sandbox: Path) -> None:
+    """Миграция плоского хранилища в шарды и обратно."""
+    with StorageAdapter(_storage_directory=sandbox) as adapter:
+        for index in range(50):
+            adapter.update(f"{KEY}_{index}", VALUE)
+
+    assert migrate_layout(sandbox, 3) == 50
+    assert all(path.is_dir() and len(path.name) == 3 for path in sandbox.iterdir())
+
+    sharded = StorageAdapter(_storage_directory=sandbox, fanout=3)
+    assert sharded.get_many(f"{KEY}_{index}" for index in range(50)) == [VALUE] * 50
+
+    assert migrate_layout(sandbox, 0) == 50
+    assert StorageAdapter(_storage_directory=sandbox).get(f"{KEY}_0") == VALUE
+    assert all(path.is_file() for path in sandbox.iterdir())
+
+
+def _multi_writer(sandbox: Path, worker: int) -> None:
+    """Процесс-писатель для теста нескольких писателей."""
+    adapter = StorageAdapter(_storage_directory=sandbox, multi_writer=True)
+    for index in range(20):
+        with adapter:
+            adapter.update(KEY, f"{VALUE}_{worker}_{index}")
+            adapter.update(f"{KEY}_{worker}", index)
+
+
+def test__multi_writer__processes(sandbox: Path) -> None:
+    """Несколько процессов коммитят в одну директорию без порчи записей."""
+    context = get_context("fork")
+    workers = [context.Process(target=_multi_writer, args=(sandbox, worker)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    adapter = StorageAdapter(_storage_directory=sandbox, multi_writer=True)
+
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert adapter.get(KEY).endswith("_19")
+    assert adapter.get_many(f"{KEY}_{worker}" for worker in range(4)) == [19] * 4
+    assert not (sandbox / ".journals").exists()
+
+
+def test__multi_writer__orphan_journal(sandbox: Path) -> None:
+    """Журнал упавшего писателя доприменяется до следующей группы."""
+    adapter = StorageAdapter(_storage_directory=sandbox, multi_writer=True)
+    with adapter:
+        adapter.update(KEY, VALUE)
+
+    content = (sandbox / KEY_FILENAME).read_bytes()
+    (sandbox / KEY_FILENAME).unlink()
+    (sandbox / ".journals").mkdir()
+    (sandbox / ".journals" / "journal-dead").write_bytes(_journal_record(content))
+
+    with adapter:
+        adapter.update(ANOTHER_KEY, ANOTHER_VALUE)
+
+    assert adapter.get(KEY) == VALUE
+    assert adapter.get(ANOTHER_KEY) == ANOTHER_VALUE
+    assert not (sandbox / ".journals").exists()
+
+
+def test__multi_writer__startup_waits_for_writers(sandbox: Path) -> None:
+    """Восстановление при открытии не трогает журнал писателя, который держит общую блокировку."""
+    (sandbox / ".locks").mkdir()
+    (sandbox / ".journals").mkdir()
+    pending = sandbox / ".journals" / "pending-live"
+    pending.write_bytes(b"")
+
+    with open(sandbox / ".locks" / "global", "a+b") as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        opener = threading.Thread(target=StorageAdapter, args=(sandbox,), kwargs={"multi_writer": True})
+        opener.start()
+        opener.join(0.2)
+
+        assert opener.is_alive()
+        assert pending.exists()
+
+    opener.join()
+
+    assert not pending.exists()
+
+
+@pytest.mark.parametrize("checksum", ["sha256", "crc32"])
+def test__view__binary(sandbox: Path, checksum: str) -> None:
+    """Буфер значения поверх файла: префикс без копирования и ленивая проверка."""
+    adapter = StorageAdapter(_storage_directory=sandbox, record_format="binary", checksum=checksum)
+    value = VALUE * 100_000
+    with adapter:
+        adapter.update(KEY, value)
+
+    with adapter.get_view(KEY) as view:
+        assert len(view) == len(value)
+        assert bytes(view.buffer[:len(VALUE)]) == VALUE.encode()
+        assert view.verified is None
+        assert b"".join(view.chunks(4096)) == value.encode()
+        assert view.verified is True
+
+    file = sandbox / KEY_FILENAME
+    data = bytearray(file.read_bytes())
+    data[-1] ^= 1
+    file.write_bytes(data)
+
+    with adapter.get_view(KEY) as view:
+        assert view.verify() is False
+    with adapter.get_view(KEY) as view, pytest.raises(IntegrityError):
+        list(view.chunks())
+
+    assert adapter.get_view(ANOTHER_KEY) is None
+
+
+def test__view__release(sandbox: Path) -> None:
+    """Отображение закрывается только после освобождения срезов буфера."""
+    adapter = StorageAdapter(_storage_directory=sandbox, record_format="binary")
+    with adapter:
+        adapter.update(KEY, VALUE)
+
+    view = adapter.get_view(KEY)
+    head = view.buffer[:2]
+
+    with pytest.raises(BufferError):
+        view.release()
+
+    head.release()
+    view.release()
+
+    assert view._mapped.closed
+
+    shutil.rmtree(sandbox)
+    sandbox.symlink_to(sandbox.with_name(f"{sandbox.name}-target"))
+
+    assert adapter.get_view(KEY) is None
+    assert not sandbox.is_symlink()
+
+
+def test__view__json(adapter: StorageAdapter) -> None:
+    """Буфер значения для файла в JSON-формате строится из проверенного значения."""
+    with adapter:
+        adapter.update(KEY, VALUE)
+
+    view = adapter.get_view(KEY)
+
+    assert bytes(view.buffer) == VALUE.encode()
+    assert view.verify() is True
+
+
+def test__benchmark__smoke() -> None:
+    """Замеры запускаются и сравниваются с базовым прогоном."""
+    from benchmark import ENGINES, UNSUPPORTED, WORKLOADS, compare, run_workload
+
+    results = [
+        run_workload(engine, workload, 20)
+        for engine in ENGINES
+        for workload in WORKLOADS
+        if (engine, workload) not in UNSUPPORTED
+    ]
+    baseline = [dict(record, ops_per_second=record["ops_per_second"] * 10) for record in results]
+
+    assert all(record["operations"] > 0 for record in results)
+    assert compare(results, results, 0.2) == []
+    assert len(compare(results, baseline, 0.2)) == len(results)
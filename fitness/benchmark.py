@@ -0,0 +1,143 @@
+"""Замер аналитических запросов `fitness.FitnessDB` по абонементам.
+
+БД заполняется `--size` клиентами с одним-тремя абонементами. Каждый запрос замеряется с
+индексом `idx_client_membership_membership` и без него, вместе с планом запроса.
+С `--bulk` дополнительно замеряется загрузка связей по именам: по одной строке и через `link_many`.
+"""
+from argparse import ArgumentParser
+from collections.abc import Callable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import sqlite3
+import time
+
+from fitness import (
+    MEMBERSHIP_CLIENTS_QUERY,
+    MEMBERSHIP_COUNTS_QUERY,
+    MULTIPLE_MEMBERSHIPS_QUERY,
+    FitnessDB,
+)
+
+
+MEMBERSHIPS = 20
+
+
+def build(path: Path, size: int) -> FitnessDB:
+    """Создать БД из `size` клиентов и связать их с абонементами."""
+    db = FitnessDB(str(path))
+    with db.conn:
+        db.conn.executemany(
+            "INSERT INTO t_membership (membership_type) VALUES (?)",
+            ((f"Membership {index}",) for index in range(MEMBERSHIPS)),
+        )
+        db.conn.executemany("INSERT INTO t_client (name) VALUES (?)", ((f"Client {index}",) for index in range(size)))
+        db.conn.executemany(
+            "INSERT INTO t_client_membership (client_id, membership_id) VALUES (?, ?)",
+            (
+                (client, (client + step * 7) % MEMBERSHIPS + 1)
+                for client in range(1, size + 1)
+                for step in range(1, 2 + client % 3)
+            ),
+        )
+    db.conn.execute("ANALYZE")
+    return db
+
+
+def _timed(func: Callable[[], object]) -> float:
+    """Время выполнения функции в секундах."""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+QUERIES: dict[str, tuple[str, tuple]] = {
+    "membership_clients": (MEMBERSHIP_CLIENTS_QUERY, ("Membership 7", -1, 0)),
+    "membership_counts": (MEMBERSHIP_COUNTS_QUERY, ()),
+    "multiple_memberships": (MULTIPLE_MEMBERSHIPS_QUERY, (3, -1, 0)),
+}
+
+
+def _measure(conn: sqlite3.Connection, indexed: bool) -> list[dict]:
+    """Замерить все запросы на соединении."""
+    return [
+        {
+            "query": name,
+            "indexed": indexed,
+            "seconds": _timed(lambda: conn.execute(query, params).fetchall()),
+            "plan": [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)],
+        }
+        for name, (query, params) in QUERIES.items()
+    ]
+
+
+def bench(size: int) -> list[dict]:
+    """Замерить запросы на БД из `size` клиентов с индексом и без него."""
+    with TemporaryDirectory() as directory:
+        path = Path(directory) / "fitness.db"
+        db = build(path, size)
+        records = _measure(db.conn, True)
+        db.conn.close()
+
+        # Новое соединение без FitnessDB, который создал бы индекс заново.
+        conn = sqlite3.connect(path)
+        conn.execute("DROP INDEX idx_client_membership_membership")
+        records.extend(_measure(conn, False))
+        conn.close()
+    return records
+
+
+def bench_bulk(size: int, single: int = 1000) -> list[dict]:
+    """Замерить загрузку `size` связей клиент-абонемент по именам.
+
+    Построчная загрузка (`add_client` и `link_client_and_membership`, коммит на строку)
+    замеряется на первых `single` клиентах.
+    """
+    clients = [f"Client {index}" for index in range(size)]
+    memberships = [f"Membership {index}" for index in range(MEMBERSHIPS)]
+    pairs = [(client, memberships[index % MEMBERSHIPS]) for index, client in enumerate(clients)]
+    with TemporaryDirectory() as directory:
+        db = FitnessDB(str(Path(directory) / "single.db"))
+        ids = [db.add_membership(membership) for membership in memberships]
+
+        def run_single() -> None:
+            for index, client in enumerate(clients[:single]):
+                db.link_client_and_membership(db.add_client(client), ids[index % MEMBERSHIPS])
+
+        single_seconds = _timed(run_single)
+        db.conn.close()
+
+        db = FitnessDB(str(Path(directory) / "bulk.db"))
+        db.upsert_memberships(memberships)
+        stats = {"upsert_clients": db.upsert_clients(clients), "link_many": db.link_many(pairs)}
+        stats["link_many_repeat"] = db.link_many(pairs)
+        db.conn.close()
+
+    records = [{"operation": "single", "rows_per_second": single / single_seconds}]
+    records.extend(
+        {"operation": operation, "rows_per_second": result.rows_per_second, "chunks": len(result.chunks)}
+        for operation, result in stats.items()
+    )
+    return records
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Запустить замер из командной строки."""
+    parser = ArgumentParser(prog="benchmark")
+    parser.add_argument("-s", "--size", type=int, default=1_000_000, help="Число клиентов")
+    parser.add_argument("-b", "--bulk", action="store_true", help="Замерить массовую загрузку связей")
+    args = parser.parse_args(argv)
+
+    if args.bulk:
+        for record in bench_bulk(args.size):
+            print(f"{record['operation']:>20}: {record['rows_per_second']:12.1f} строк/с")
+        return
+
+    for record in bench(args.size):
+        label = "с индексом" if record["indexed"] else "без индекса"
+        print(f"{record['query']:>20} {label:>12}: {record['seconds'] * 1000:10.1f} мс")
+        for step in record["plan"]:
+            print(f"{'':>34}{step}")
+
+
+if __name__ == "__main__":
+    main()
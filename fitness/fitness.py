@@ -1,7 +1,96 @@
+import itertools
+import json
 import sqlite3
+import time
 
 import typing as tp
 
+from dataclasses import dataclass, field
+
+
+# Число строк в одной транзакции массовых операций.
+CHUNK_SIZE = 10_000
+
+
+@dataclass
+class ChunkStats:
+    """
+    Итог одной транзакции массовой операции.
+    rows - число строк на входе, changed - сколько строк реально добавлено,
+    skipped - сколько связей пропущено из-за неизвестных имен.
+    """
+    rows: int
+    changed: int
+    skipped: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class BulkStats:
+    """
+    Итог массовой операции по транзакциям.
+    """
+    chunks: tp.List[ChunkStats] = field(default_factory=list)
+
+    @property
+    def rows(self) -> int:
+        return sum(chunk.rows for chunk in self.chunks)
+
+    @property
+    def changed(self) -> int:
+        return sum(chunk.changed for chunk in self.chunks)
+
+    @property
+    def skipped(self) -> int:
+        return sum(chunk.skipped for chunk in self.chunks)
+
+    @property
+    def rows_per_second(self) -> float:
+        seconds = sum(chunk.seconds for chunk in self.chunks)
+        return self.rows / seconds if seconds else 0.0
+
+
+def _chunks(rows: tp.Iterable[tp.Any], size: int) -> tp.Iterator[tp.List[tp.Any]]:
+    """Разбивает поток строк на списки по size штук."""
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+# Запросы аналитики по абонементам. Вынесены в константы, чтобы их план можно было
+# проверить через FitnessDB.query_plan.
+MEMBERSHIP_CLIENTS_QUERY = '''
+    SELECT c.name
+    FROM t_membership m
+    JOIN t_client_membership cm ON cm.membership_id = m.id
+    JOIN t_client c ON c.id = cm.client_id
+    WHERE m.membership_type = ?
+    ORDER BY cm.client_id
+    LIMIT ? OFFSET ?
+'''
+
+MEMBERSHIP_COUNTS_QUERY = '''
+    SELECT m.membership_type, count(cm.client_id)
+    FROM t_membership m
+    LEFT JOIN t_client_membership cm ON cm.membership_id = m.id
+    GROUP BY m.id
+    ORDER BY m.id
+'''
+
+MULTIPLE_MEMBERSHIPS_QUERY = '''
+    SELECT c.name, count(*)
+    FROM t_client_membership cm
+    JOIN t_client c ON c.id = cm.client_id
+    GROUP BY cm.client_id
+    HAVING count(*) >= ?
+    ORDER BY cm.client_id
+    LIMIT ? OFFSET ?
+'''
+
 
 class FitnessDB:
     def __init__(self, db_name: str = "fitness.db") -> None:
@@ -28,6 +117,7 @@ class FitnessDB:
 
         ### тут нужно будет добавить таблицу
         self.add_table_m2m_membership(cursor)
+        self.add_indexes(cursor)
 
     def add_table_m2m_membership(self, cursor: sqlite3.Cursor) -> None:
         """
@@ -44,6 +134,17 @@ class FitnessDB:
         ''')
         self.conn.commit()
 
+    def add_indexes(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Индексы для обратных запросов по абонементу.
+        Первичный ключ (client_id, membership_id) покрывает запросы по клиенту,
+        а (membership_id, client_id) - по абонементу, без обращения к самой таблице.
+        """
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_client_membership_membership
+            ON t_client_membership (membership_id, client_id)
+        ''')
+        self.conn.commit()
 
     def add_client(self, name: str) -> int:
         """
@@ -95,3 +196,128 @@ class FitnessDB:
         cursor.close()
         return memberships
 
+    def get_membership_clients(self, membership_type: str, limit: int = -1,
+                               offset: int = 0) -> tp.List[tp.Tuple[str]]:
+        """
+        Получает клиентов с указанным типом абонемента в порядке добавления клиентов
+        (по id клиента, а не по времени выдачи абонемента), чтобы порядок читался прямо
+        из индекса (membership_id, client_id). limit = -1 - без ограничения.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(MEMBERSHIP_CLIENTS_QUERY, (membership_type, limit, offset))
+        clients = cursor.fetchall()
+        cursor.close()
+        return clients
+
+    def count_clients_by_membership(self) -> tp.List[tp.Tuple[str, int]]:
+        """
+        Получает число клиентов по каждому типу абонемента, включая пустые.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(MEMBERSHIP_COUNTS_QUERY)
+        counts = cursor.fetchall()
+        cursor.close()
+        return counts
+
+    def get_clients_with_multiple_memberships(self, min_count: int = 2, limit: int = -1,
+                                              offset: int = 0) -> tp.List[tp.Tuple[str, int]]:
+        """
+        Получает клиентов, у которых не меньше min_count абонементов, вместе с их числом,
+        в порядке добавления клиентов (по id клиента).
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(MULTIPLE_MEMBERSHIPS_QUERY, (min_count, limit, offset))
+        clients = cursor.fetchall()
+        cursor.close()
+        return clients
+
+    def query_plan(self, query: str, params: tp.Sequence[tp.Any] = ()) -> tp.List[str]:
+        """
+        Возвращает шаги плана запроса из EXPLAIN QUERY PLAN.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        plan = [row[3] for row in cursor.fetchall()]
+        cursor.close()
+        return plan
+
+    def _bulk(self, rows: tp.Iterable[tp.Any],
+              apply: tp.Callable[[sqlite3.Cursor, tp.List[tp.Any]], int], chunk_size: int) -> BulkStats:
+        """
+        Выполняет apply над каждой порцией из chunk_size строк в отдельной транзакции.
+        apply возвращает число пропущенных строк.
+        """
+        stats = BulkStats()
+        cursor = self.conn.cursor()
+        for chunk in _chunks(rows, chunk_size):
+            start = time.perf_counter()
+            changes = self.conn.total_changes
+            with self.conn:
+                skipped = apply(cursor, chunk)
+            stats.chunks.append(ChunkStats(
+                rows=len(chunk),
+                changed=self.conn.total_changes - changes,
+                skipped=skipped,
+                seconds=time.perf_counter() - start,
+            ))
+        cursor.close()
+        return stats
+
+    def upsert_clients(self, names: tp.Iterable[str], chunk_size: int = CHUNK_SIZE) -> BulkStats:
+        """
+        Массово добавляет клиентов в таблицу t_client, пропуская уже существующих.
+        """
+        def apply(cursor: sqlite3.Cursor, chunk: tp.List[str]) -> int:
+            cursor.executemany('''
+                INSERT INTO t_client (name) VALUES (?) ON CONFLICT (name) DO NOTHING
+            ''', ((name,) for name in chunk))
+            return 0
+
+        return self._bulk(names, apply, chunk_size)
+
+    def upsert_memberships(self, membership_types: tp.Iterable[str], chunk_size: int = CHUNK_SIZE) -> BulkStats:
+        """
+        Массово добавляет типы абонементов в таблицу t_membership, пропуская уже существующие.
+        """
+        def apply(cursor: sqlite3.Cursor, chunk: tp.List[str]) -> int:
+            cursor.executemany('''
+                INSERT INTO t_membership (membership_type) VALUES (?) ON CONFLICT (membership_type) DO NOTHING
+            ''', ((membership_type,) for membership_type in chunk))
+            return 0
+
+        return self._bulk(membership_types, apply, chunk_size)
+
+    def link_many(self, pairs: tp.Iterable[tp.Tuple[tp.Union[int, str], tp.Union[int, str]]],
+                  chunk_size: int = CHUNK_SIZE) -> BulkStats:
+        """
+        Массово связывает клиентов и абонементы в таблице t_client_membership.
+        Пара - (клиент, абонемент), каждый задается ID или именем. Имена порции переводятся
+        в ID одним запросом, пары с неизвестными именами пропускаются, уже существующие
+        связи не дублируются.
+        """
+        def apply(cursor: sqlite3.Cursor, chunk: tp.List[tp.Tuple[tp.Any, tp.Any]]) -> int:
+            clients = {client for client, _ in chunk if isinstance(client, str)}
+            memberships = {membership for _, membership in chunk if isinstance(membership, str)}
+            cursor.execute('''
+                SELECT 0, name, id FROM t_client WHERE name IN (SELECT value FROM json_each(?))
+                UNION ALL
+                SELECT 1, membership_type, id FROM t_membership
+                WHERE membership_type IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(list(clients)), json.dumps(list(memberships))))
+            ids: tp.Tuple[tp.Dict[str, int], tp.Dict[str, int]] = (dict(), dict())
+            for table, name, id_ in cursor.fetchall():
+                ids[table][name] = id_
+
+            links = [
+                (ids[0].get(client) if isinstance(client, str) else client,
+                 ids[1].get(membership) if isinstance(membership, str) else membership)
+                for client, membership in chunk
+            ]
+            resolved = [link for link in links if None not in link]
+            cursor.executemany('''
+                INSERT INTO t_client_membership (client_id, membership_id) VALUES (?, ?)
+                ON CONFLICT (client_id, membership_id) DO NOTHING
+            ''', resolved)
+            return len(links) - len(resolved)
+
+        return self._bulk(pairs, apply, chunk_size)
@@ -1,5 +1,10 @@
 import pytest
-from fitness import FitnessDB
+from fitness import (
+    MEMBERSHIP_CLIENTS_QUERY,
+    MEMBERSHIP_COUNTS_QUERY,
+    MULTIPLE_MEMBERSHIPS_QUERY,
+    FitnessDB,
+)
 
 
 @pytest.fixture
@@ -45,3 +50,63 @@ def test_sql_injection_prevention(db):
     memberships = db.get_client_membership("John'; DROP TABLE t_client; --")
     assert len(memberships) == 1, "SQL-инъекция сработала"
     assert ("Yoga",) in memberships, "Абонемент 'Yoga' отсутствует."
+
+
+@pytest.fixture
+def club(db):
+    gym = db.add_membership("Gym Access")
+    pool = db.add_membership("Swimming Pool")
+    db.add_membership("Yoga")
+    for name, memberships in [("John Doe", [gym, pool]), ("Jane Doe", [pool]), ("Jim Beam", [gym, pool])]:
+        client_id = db.add_client(name)
+        for membership_id in memberships:
+            db.link_client_and_membership(client_id, membership_id)
+    return db
+
+
+def test_membership_analytics(club):
+    assert club.get_membership_clients("Swimming Pool") == [("John Doe",), ("Jane Doe",), ("Jim Beam",)]
+    assert club.get_membership_clients("Swimming Pool", limit=1, offset=1) == [("Jane Doe",)]
+    assert club.get_membership_clients("Boxing") == []
+    assert club.count_clients_by_membership() == [("Gym Access", 2), ("Swimming Pool", 3), ("Yoga", 0)]
+    assert club.get_clients_with_multiple_memberships() == [("John Doe", 2), ("Jim Beam", 2)]
+    assert club.get_clients_with_multiple_memberships(min_count=3) == []
+
+
+def test_membership_clients_order(db):
+    yoga = db.add_membership("Yoga")
+    first = db.add_client("First")
+    second = db.add_client("Second")
+    db.link_client_and_membership(second, yoga)
+    db.link_client_and_membership(first, yoga)
+
+    assert db.get_membership_clients("Yoga") == [("First",), ("Second",)], "Клиенты идут не в порядке добавления"
+
+
+@pytest.mark.parametrize("query, params", [
+    (MEMBERSHIP_CLIENTS_QUERY, ("Gym Access", -1, 0)),
+    (MEMBERSHIP_COUNTS_QUERY, ()),
+    (MULTIPLE_MEMBERSHIPS_QUERY, (2, -1, 0)),
+])
+def test_membership_analytics_query_plan(club, query, params):
+    plan = club.query_plan(query, params)
+    link_steps = [step for step in plan if " cm " in f"{step} "]
+
+    assert link_steps and all("COVERING INDEX" in step for step in link_steps), \
+        f"Связи читаются не из покрывающего индекса: {plan}"
+    assert not any("TEMP B-TREE" in step for step in plan), f"Запросу нужна сортировка: {plan}"
+
+
+def test_bulk_upsert_and_link(db):
+    yoga = db.add_membership("Yoga")
+    assert db.upsert_memberships(["Gym Access", "Yoga", "Gym Access"]).changed == 1
+    stats = db.upsert_clients((f"Client {index}" for index in range(5)), chunk_size=2)
+    assert [chunk.rows for chunk in stats.chunks] == [2, 2, 1]
+    assert stats.changed == 5
+    assert db.upsert_clients(["Client 0", "Client 4"]).changed == 0, "Повторная загрузка добавила дубликаты"
+
+    pairs = [("Client 0", "Gym Access"), ("Client 0", yoga), ("Client 1", "Boxing"), ("Nobody", "Yoga")]
+    stats = db.link_many(pairs, chunk_size=3)
+    assert (stats.rows, stats.changed, stats.skipped) == (4, 2, 2)
+    assert db.link_many(pairs).changed == 0, "Повторная загрузка добавила дубликаты связей"
+    assert sorted(db.get_client_membership("Client 0")) == [("Gym Access",), ("Yoga",)]
@@ -0,0 +1,249 @@
+"""Замер запросов чтения `library.Library` на каталогах разного размера.
+
+Для каждого размера каталог загружается через `add_books_bulk`, после чего замеряются текущие
+запросы с индексами и прежние (N+1, два запроса на автора, поиск через LIKE) на той же БД без индексов.
+С `--concurrency` дополнительно замеряется смешанная многопоточная нагрузка с пулом соединений и без него,
+с `--borrow` - одновременная выдача одних и тех же книг из нескольких потоков.
+"""
+from argparse import ArgumentParser
+from collections.abc import Callable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import random
+import sqlite3
+import threading
+import time
+
+from library import Library
+
+
+AUTHORS = 10_000
+WORDS = [
+    "shadow", "river", "silent", "garden", "winter", "empire", "glass", "hunter", "ocean", "crown",
+    "forest", "mirror", "stone", "harbor", "flame", "storm", "letter", "island", "night", "falcon",
+]
+
+
+def build(path: Path, size: int) -> Library:
+    """Создать каталог из `size` книг, половина из которых выдана."""
+    library = Library(str(path))
+    library.add_books_bulk(
+        (
+            f"{WORDS[index % len(WORDS)]} {WORDS[index * 7 % len(WORDS)]} {WORDS[index * 13 % 17]}{index}",
+            f"Author {index % AUTHORS}", 1900 + index % 120, f"Genre {index % 50}",
+        )
+        for index in range(size)
+    )
+    with library.conn:
+        library.conn.execute("UPDATE t_book SET available = 0 WHERE id % 2 = 0")
+    return library
+
+
+def legacy_available_books(library: Library) -> list:
+    """Прежний `get_available_books`: отдельный запрос названия на каждую книгу."""
+    cursor = library.conn.cursor()
+    ids = [row[0] for row in cursor.execute("SELECT id FROM t_book WHERE available = 1").fetchall()]
+    return [(id_, cursor.execute("SELECT title FROM t_book where id = ?", (id_,)).fetchone()[0]) for id_ in ids]
+
+
+def legacy_books_by_author(library: Library, name: str) -> list:
+    """Прежний `get_books_by_author`: ID автора и книги отдельными запросами."""
+    cursor = library.conn.cursor()
+    author = cursor.execute("SELECT id FROM t_author WHERE name = ?", (name,)).fetchone()
+    if not author:
+        return []
+    return cursor.execute("SELECT id, title, author_id FROM t_book WHERE author_id = ?", author).fetchall()
+
+
+def legacy_search(library: Library, query: str) -> list:
+    """Поиск без полнотекстового индекса: подстрока названия через LIKE."""
+    return library.conn.execute(
+        "SELECT id, title FROM t_book WHERE title LIKE ? LIMIT 20", (f"%{query}%",)
+    ).fetchall()
+
+
+def _timed(func: Callable[[], object], repeat: int = 1) -> float:
+    """Среднее время выполнения функции в секундах."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(size: int, lookups: int) -> list[dict]:
+    """Замерить запросы на каталоге из `size` книг."""
+    with TemporaryDirectory() as directory:
+        library = build(Path(directory) / "library.db", size)
+        names = [f"Author {index * 7 % AUTHORS}" for index in range(lookups)]
+        # Слово из названия конкретной книги, его начало и то же слово с опечаткой.
+        books = [index * 7919 % size for index in range(lookups)]
+        queries = [f"{WORDS[index * 13 % 17]}{index}" for index in books]
+        prefixes = [query[:-1] for query in queries]
+        typos = [query[0] + query[2:] for query in queries]
+
+        current = {
+            "available_books": _timed(library.get_available_books),
+            "books_by_author": _timed(lambda: [library.get_books_by_author(name) for name in names]) / lookups,
+            "search": _timed(lambda: [library.search_books(query) for query in queries]) / lookups,
+            "search_prefix": _timed(lambda: [library.search_books(query) for query in prefixes]) / lookups,
+            "search_fuzzy": _timed(lambda: [library.search_books(query, fuzzy=True) for query in typos]) / lookups,
+        }
+        library.conn.executescript(
+            "DROP INDEX idx_book_author; DROP INDEX idx_book_title; DROP INDEX idx_book_available;"
+        )
+        legacy = {
+            "available_books": _timed(lambda: legacy_available_books(library)),
+            "books_by_author": _timed(lambda: [legacy_books_by_author(library, name) for name in names]) / lookups,
+            "search": _timed(lambda: [legacy_search(library, query) for query in queries]) / lookups,
+            "search_prefix": _timed(lambda: [legacy_search(library, query) for query in prefixes]) / lookups,
+            "search_fuzzy": _timed(lambda: [legacy_search(library, query) for query in typos]) / lookups,
+        }
+        library.conn.close()
+
+    return [
+        {"size": size, "query": query, "legacy": legacy[query], "current": current[query]}
+        for query in current
+    ]
+
+
+def _worker(library: Library | Callable[[], Library], worker: int, operations: int, size: int,
+            write_ratio: float, errors: list[int]) -> None:
+    """Поток нагрузки: выдача случайных книг вперемешку со списком доступных книг."""
+    library = library if isinstance(library, Library) else library()
+    rng = random.Random(worker)
+    for _ in range(operations):
+        try:
+            if rng.random() < write_ratio:
+                library.borrow_book(rng.randrange(1, size + 1), 1)
+            else:
+                library.get_available_books()
+        except sqlite3.OperationalError:
+            errors[worker] += 1
+
+
+def bench_concurrency(threads: int, operations: int, size: int = 10_000, write_ratio: float = 0.2) -> list[dict]:
+    """Замерить смешанную нагрузку из нескольких потоков.
+
+    `legacy` - у каждого потока свое соединение в режиме журнала отката, `pool` - общий
+    `Library` с WAL и пулом соединений для чтения.
+    """
+    records = list()
+    for mode in ("legacy", "pool"):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "library.db"
+            build(path, size).close()
+            if mode == "pool":
+                library = Library(str(path), pool_size=threads)
+            else:
+                library = lambda: Library(str(path))
+            errors = [0] * threads
+            workers = [
+                threading.Thread(target=_worker, args=(library, worker, operations, size, write_ratio, errors))
+                for worker in range(threads)
+            ]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            if isinstance(library, Library):
+                library.close()
+        records.append({
+            "mode": mode,
+            "threads": threads,
+            "ops_per_second": threads * operations / elapsed,
+            "errors": sum(errors),
+        })
+    return records
+
+
+def bench_borrow(threads: int, books: int = 1_000) -> dict:
+    """Замерить одновременную выдачу одних и тех же книг из нескольких потоков.
+
+    Каждый поток со своим соединением пытается выдать все `books` книг; успешной должна
+    оказаться ровно одна выдача каждой книги.
+    """
+    with TemporaryDirectory() as directory:
+        path = Path(directory) / "library.db"
+        library = Library(path)
+        author_id = library.add_author("Author")
+        member_ids = [library.add_member(f"Member {index}") for index in range(threads)]
+        library.add_books_bulk((f"Book {index}", author_id, 2000, None) for index in range(books))
+        successes = [0] * threads
+
+        def work(worker: int) -> None:
+            own = Library(path)
+            for book_id in range(1, books + 1):
+                successes[worker] += own.borrow_book(book_id, member_ids[worker])
+            own.close()
+
+        workers = [threading.Thread(target=work, args=(worker,)) for worker in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        library.close()
+    return {
+        "threads": threads,
+        "attempts_per_second": threads * books / elapsed,
+        "borrowed": sum(successes),
+        "books": books,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Запустить замер из командной строки."""
+    parser = ArgumentParser(prog="benchmark")
+    parser.add_argument(
+        "-s", "--size",
+        type=int,
+        nargs="*",
+        default=[10_000, 100_000, 1_000_000],
+        help="Размеры каталога в книгах"
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        nargs="*",
+        default=[],
+        help="Числа потоков для замера смешанной нагрузки (например: 1 4 16)"
+    )
+    parser.add_argument(
+        "-b", "--borrow",
+        type=int,
+        nargs="*",
+        default=[],
+        help="Числа потоков для замера одновременной выдачи одних и тех же книг (например: 1 4 16)"
+    )
+    parser.add_argument("-w", "--write-ratio", type=float, default=0.2, help="Доля выдач книг в смешанной нагрузке")
+    parser.add_argument("-l", "--lookups", type=int, default=100, help="Число запросов по автору и поисковых запросов")
+    args = parser.parse_args(argv)
+
+    for size in args.size:
+        for record in bench(size, args.lookups):
+            print(
+                f"{record['size']:>9} {record['query']:>16}: "
+                f"{record['legacy'] * 1000:10.3f} мс -> {record['current'] * 1000:10.3f} мс "
+                f"({record['legacy'] / record['current']:.1f}x)"
+            )
+
+    for threads in args.concurrency:
+        for record in bench_concurrency(threads, operations=200, write_ratio=args.write_ratio):
+            print(
+                f"{record['threads']:>3} потоков {record['mode']:>6}: "
+                f"{record['ops_per_second']:10.1f} оп/с, ошибок блокировки: {record['errors']}"
+            )
+
+    for threads in args.borrow:
+        record = bench_borrow(threads)
+        print(
+            f"{record['threads']:>3} потоков выдача: {record['attempts_per_second']:10.1f} попыток/с, "
+            f"выдано {record['borrowed']} из {record['books']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,317 @@
+import contextlib
+import csv
+import functools
+import itertools
+import json
+import queue
+import re
 import sqlite3
+import threading
+import time
 
+from dataclasses import dataclass
 from datetime import date
+from pathlib import Path
 
 import typing as tp
 from typing import List, Any
 
 
+# Число строк в одной транзакции массовой загрузки.
+BULK_CHUNK_SIZE = 10_000
+
+# Столбцы массовой загрузки, значения которых read_rows явно приводит к int.
+INT_COLUMNS = ("author_id", "genre_id", "publication_year")
+
+
+@functools.cache
+def _supports_trigram() -> bool:
+    """
+    Проверяет, есть ли в SQLite токенизатор trigram (появился в SQLite 3.34).
+    Проверка выполняется при первом вызове, результат запоминается.
+    """
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t_probe USING fts5 (text, tokenize = 'trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def _trigram_tokenizer() -> str:
+    """
+    Возвращает токенизатор индекса t_book_trigram. Без trigram индекс строится на unicode61,
+    чтобы схема и триггеры не менялись, а нечеткий поиск идет через LIKE.
+    """
+    return "trigram" if _supports_trigram() else "unicode61"
+
+
+# Миграции схемы. Номер примененной миграции хранится в PRAGMA user_version,
+# новые миграции добавляются только в конец списка. {trigram_tokenizer} в тексте
+# заменяется на результат _trigram_tokenizer().
+MIGRATIONS: tp.List[str] = [
+    # 1: индексы для чтения книг по автору, названию и доступности.
+    '''
+    CREATE INDEX IF NOT EXISTS idx_book_author ON t_book (author_id);
+    CREATE INDEX IF NOT EXISTS idx_book_title ON t_book (title);
+    CREATE INDEX IF NOT EXISTS idx_book_available ON t_book (id, title) WHERE available = 1;
+    ''',
+    # 2: полнотекстовый поиск по названию и автору. t_book_fts - поиск по словам и префиксам,
+    # t_book_trigram - нечеткий поиск по триграммам. Оба индекса поддерживаются триггерами.
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS t_book_fts USING fts5 (
+        title, author, prefix = '2 3', tokenize = 'unicode61 remove_diacritics 2'
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS t_book_trigram USING fts5 (title, author, tokenize = '{trigram_tokenizer}');
+    CREATE VIRTUAL TABLE IF NOT EXISTS t_book_trigram_vocab USING fts5vocab (t_book_trigram, 'row');
+
+    CREATE TRIGGER IF NOT EXISTS t_book_search_insert AFTER INSERT ON t_book BEGIN
+        INSERT INTO t_book_fts (rowid, title, author)
+        VALUES (new.id, new.title, (SELECT name FROM t_author WHERE id = new.author_id));
+        INSERT INTO t_book_trigram (rowid, title, author)
+        VALUES (new.id, new.title, (SELECT name FROM t_author WHERE id = new.author_id));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS t_book_search_delete AFTER DELETE ON t_book BEGIN
+        DELETE FROM t_book_fts WHERE rowid = old.id;
+        DELETE FROM t_book_trigram WHERE rowid = old.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS t_book_search_update AFTER UPDATE OF title, author_id ON t_book BEGIN
+        UPDATE t_book_fts SET title = new.title, author = (SELECT name FROM t_author WHERE id = new.author_id)
+        WHERE rowid = new.id;
+        UPDATE t_book_trigram SET title = new.title, author = (SELECT name FROM t_author WHERE id = new.author_id)
+        WHERE rowid = new.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS t_author_search_update AFTER UPDATE OF name ON t_author BEGIN
+        UPDATE t_book_fts SET author = new.name WHERE rowid IN (SELECT id FROM t_book WHERE author_id = new.id);
+        UPDATE t_book_trigram SET author = new.name WHERE rowid IN (SELECT id FROM t_book WHERE author_id = new.id);
+    END;
+
+    INSERT INTO t_book_fts (rowid, title, author)
+    SELECT b.id, b.title, a.name FROM t_book b LEFT JOIN t_author a ON a.id = b.author_id;
+    INSERT INTO t_book_trigram (rowid, title, author)
+    SELECT b.id, b.title, a.name FROM t_book b LEFT JOIN t_author a ON a.id = b.author_id;
+    ''',
+    # 3: индексы истории выдач по читателю и по книге.
+    '''
+    CREATE INDEX IF NOT EXISTS idx_borrowed_member_date ON t_borrowed_book (member_id, borrow_date);
+    CREATE INDEX IF NOT EXISTS idx_borrowed_book ON t_borrowed_book (book_id);
+    ''',
+]
+
+# Вес совпадения в названии относительно совпадения в имени автора при ранжировании поиска.
+TITLE_WEIGHT = 10.0
+
+# Число самых редких триграмм запроса, по которым нечеткий поиск отбирает кандидатов.
+# Одна опечатка портит не больше трех триграмм, поэтому среди любых четырех хотя бы
+# одна есть в искомой книге.
+FUZZY_TRIGRAMS = 4
+
+
+# Запросы чтения книг и истории выдач. Вынесены в константы, чтобы их план можно было
+# проверить через Library.query_plan.
+BOOKS_BY_AUTHOR_QUERY = '''
+    SELECT b.id, b.title, b.author_id
+    FROM t_book b
+    JOIN t_author a ON a.id = b.author_id
+    WHERE a.name = ?
+    ORDER BY b.id
+'''
+
+AVAILABLE_BOOKS_QUERY = '''
+    SELECT id, title FROM t_book WHERE available = 1 ORDER BY id
+'''
+
+BORROW_HISTORY_QUERY = '''
+    SELECT bb.id, bb.book_id, b.title, bb.borrow_date, bb.return_date
+    FROM t_borrowed_book bb
+    JOIN t_book b ON b.id = bb.book_id
+    WHERE bb.member_id = ?
+    ORDER BY bb.borrow_date DESC, bb.id DESC
+    LIMIT ? OFFSET ?
+'''
+
+BOOK_HISTORY_QUERY = '''
+    SELECT id, member_id, borrow_date, return_date
+    FROM t_borrowed_book
+    WHERE book_id = ?
+    ORDER BY id DESC
+    LIMIT ? OFFSET ?
+'''
+
+
+@dataclass
+class BulkStats:
+    """
+    Итог массовой загрузки.
+    rows - число обработанных строк
+    chunks - число транзакций
+    seconds - время загрузки
+    """
+    rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def read_rows(stream: tp.TextIO, fmt: str = "csv") -> tp.Iterator[tp.Dict[str, tp.Any]]:
+    """
+    Читает строки для массовой загрузки из потока CSV (с заголовком) или JSONL.
+    Пустые значения CSV превращаются в None, столбцы из INT_COLUMNS - в int.
+    ID передаются только в столбцах author_id и genre_id: значения author и genre всегда
+    считаются именами, даже если состоят из цифр.
+    """
+    if fmt == "csv":
+        rows = ({key: value if value != "" else None for key, value in row.items()} for row in csv.DictReader(stream))
+    elif fmt == "jsonl":
+        rows = (json.loads(line) for line in stream if line.strip())
+    else:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    for row in rows:
+        yield {key: _to_int(value) if key in INT_COLUMNS else value for key, value in row.items()}
+
+
+def _chunks(rows: tp.Iterable[tp.Any], size: int) -> tp.Iterator[tp.List[tp.Any]]:
+    """Разбивает поток строк на списки по size штук."""
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _to_int(value: tp.Any) -> tp.Optional[int]:
+    """Приводит значение из CSV/JSONL к int, сохраняя None."""
+    return None if value is None else int(value)
+
+
+# Настройки соединений в режиме пула: WAL позволяет читателям не ждать писателя,
+# synchronous = NORMAL в WAL не теряет согласованность при сбое, cache_size в KiB (отрицательное).
+WRITER_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -65536, "busy_timeout": 5000}
+READER_PRAGMAS = {"cache_size": -16384, "busy_timeout": 5000}
+
+
+def _configure(conn: sqlite3.Connection, pragmas: tp.Dict[str, tp.Any]) -> sqlite3.Connection:
+    """Применяет PRAGMA к соединению."""
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class ReadOnlyPool:
+    """
+    Ограниченный пул соединений только для чтения.
+    Соединения создаются по мере надобности, но не больше size; при исчерпании пула
+    поток ждет, пока соединение не вернут.
+    """
+
+    def __init__(self, db_name: tp.Union[str, Path], size: int) -> None:
+        self.uri = f"{Path(db_name).resolve().as_uri()}?mode=ro"
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return _configure(
+                    sqlite3.connect(self.uri, uri=True, check_same_thread=False), READER_PRAGMAS
+                )
+        return self._idle.get()
+
+    @contextlib.contextmanager
+    def connection(self) -> tp.Iterator[sqlite3.Connection]:
+        """Выдает соединение из пула на время блока with."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        """Закрывает свободные соединения пула."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
 class Library:
-    def __init__(self, db_name="library.db"):
-        self.conn = sqlite3.connect(db_name)
+    def __init__(self, db_name: tp.Union[str, Path] = "library.db", pool_size: int = 0):
+        """
+        db_name - путь к файлу БД (str или Path) или ":memory:".
+        pool_size = 0 - одно соединение, как раньше.
+        pool_size > 0 - режим для многопоточного доступа: одно пишущее соединение в WAL,
+        через которое записи идут по очереди, и пул из pool_size соединений только для чтения.
+        """
+        self._write_lock = threading.RLock()
+        self._readers: tp.Optional[ReadOnlyPool] = None
+        if pool_size:
+            if str(db_name) == ":memory:" or str(db_name).startswith("file:"):
+                raise ValueError("Пул соединений требует файловую БД")
+            self.conn = _configure(sqlite3.connect(db_name, check_same_thread=False), WRITER_PRAGMAS)
+        else:
+            self.conn = sqlite3.connect(db_name)
         self.create_tables()
+        self.migrate()
+        self.trigram = self._has_trigram_index()
+        if pool_size:
+            self._readers = ReadOnlyPool(db_name, pool_size)
+
+    def close(self) -> None:
+        """
+        Закрывает соединения с БД.
+        """
+        if self._readers is not None:
+            self._readers.close()
+        self.conn.close()
+
+    @contextlib.contextmanager
+    def _writing(self) -> tp.Iterator[sqlite3.Connection]:
+        """
+        Выдает пишущее соединение; записи из разных потоков выполняются по очереди.
+        """
+        with self._write_lock:
+            yield self.conn
+
+    @contextlib.contextmanager
+    def _reading(self) -> tp.Iterator[sqlite3.Connection]:
+        """
+        Выдает соединение для чтения: из пула, если он есть, иначе основное.
+        """
+        if self._readers is None:
+            with self._writing() as conn:
+                yield conn
+        else:
+            with self._readers.connection() as conn:
+                yield conn
+
+    def _fetchall(self, query: str, params: tp.Sequence[tp.Any] = ()) -> tp.List[tp.Any]:
+        """
+        Выполняет читающий запрос и возвращает все строки.
+        """
+        with self._reading() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def query_plan(self, query: str, params: tp.Sequence[tp.Any] = ()) -> tp.List[str]:
+        """
+        Возвращает шаги плана запроса из EXPLAIN QUERY PLAN.
+        """
+        return [row[3] for row in self._fetchall(f"EXPLAIN QUERY PLAN {query}", params)]
 
     def create_tables(self):
         cursor = self.conn.cursor()
@@ -100,16 +402,36 @@ class Library:
 
         self.conn.commit()
 
+    def migrate(self) -> int:
+        """
+        Применяет к БД миграции из MIGRATIONS, которых в ней еще нет.
+        Возвращаем номер версии схемы.
+        """
+        cursor = self.conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            script = script.format(trigram_tokenizer=_trigram_tokenizer())
+            cursor.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+        return len(MIGRATIONS)
+
+    def _has_trigram_index(self) -> bool:
+        """
+        Проверяет, построен ли t_book_trigram на токенизаторе trigram.
+        """
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 't_book_trigram'").fetchone()
+        return row is not None and "'trigram'" in row[0]
+
     def add_author(self, name: str) -> int:
         """
         Добавляет автора в таблицу t_author.
         Возвращаем ID добавленного автора.
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO t_author (name) VALUES (?)
-        ''', (name,))
-        self.conn.commit()
+        with self._writing():
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                INSERT INTO t_author (name) VALUES (?)
+            ''', (name,))
+            self.conn.commit()
         return cursor.lastrowid
 
     def add_genre(self, name: str) -> int:
@@ -117,11 +439,12 @@ class Library:
         Добавляет жанр в таблицу t_genre.
         Возвращаем ID добавленного жанра.
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO t_genre (name) VALUES (?)
-        ''', (name,))
-        self.conn.commit()
+        with self._writing():
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                INSERT INTO t_genre (name) VALUES (?)
+            ''', (name,))
+            self.conn.commit()
         return cursor.lastrowid
 
     def add_book(self, title: str, author_id: int, publication_year=None, genre_id=None) -> int:
@@ -129,11 +452,12 @@ class Library:
         Добавляет книгу в таблицу t_book.
         Возвращаем ID добавленной книги.
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO t_book (title, author_id, publication_year, genre_id) VALUES (?, ?, ? ,?)
-        ''', (title, author_id, publication_year, genre_id,))
-        self.conn.commit()
+        with self._writing():
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                INSERT INTO t_book (title, author_id, publication_year, genre_id) VALUES (?, ?, ? ,?)
+            ''', (title, author_id, publication_year, genre_id,))
+            self.conn.commit()
         return cursor.lastrowid
 
     def add_member(self, name: str, membership_date="now") -> int:
@@ -141,11 +465,12 @@ class Library:
         Добавляет нового члена библиотеки в таблицу t_member.
         Возвращаем ID добавленного члена.
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO t_member (name, membership_date) VALUES (?, ?)
-        ''', (name, membership_date,))
-        self.conn.commit()
+        with self._writing():
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                INSERT INTO t_member (name, membership_date) VALUES (?, ?)
+            ''', (name, membership_date,))
+            self.conn.commit()
         return cursor.lastrowid
 
     def get_books_by_author(self, author_name: str) -> tp.List[tp.Any]:
@@ -153,88 +478,236 @@ class Library:
         Достать список книг по имени автора.
         Метод должен возвращать список кортежей всех доступных книг по автору.
         """
-        cursor = self.conn.cursor()
-
-        # Получаем ID автора по имени
-        cursor.execute('''
-            SELECT id FROM t_author WHERE name = ?
-        ''', (author_name,))
-        author = cursor.fetchone()
-
-        if not author:
-            return []
-
-        author_id = author[0]
-
-        cursor.execute('''
-            SELECT id, title, author_id
-            FROM t_book
-            WHERE author_id = ?
-        ''', (author_id,))
-        books = [
-            (
-                row[0],
-                row[1],
-                row[2]
-            )
-            for row in cursor.fetchall()
-        ]
-        return books
+        return self._fetchall(BOOKS_BY_AUTHOR_QUERY, (author_name,))
 
     def get_available_books(self) -> tp.List[tp.Tuple[tp.Any, tp.Any]]:
         """
         Возвращает список всех доступных книг.
         Метод должен возвращать список кортежей всех доступных книг
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id FROM t_book WHERE available = 1
-        ''')
-        id_list = [row[0] for row in cursor.fetchall()]
-        available_books = []
-        for id_ in id_list:
-            cursor.execute('''
-                SELECT title FROM t_book where id = ?
-            ''', (id_,))
-            book = cursor.fetchone()
-            available_books.append((id_, book[0]))
-        return available_books
-
+        return self._fetchall(AVAILABLE_BOOKS_QUERY)
 
     def borrow_book(self, book_id: int, member_id: int) -> bool:
         """
         Записывать выдачу книги члену библиотеки.
         Метод должен True если успех иначе False.
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT available FROM t_book WHERE id = ?  
-        ''', (book_id,))
-        avail = cursor.fetchone()
-        if avail[0]:
-            cursor.execute('''
-                INSERT INTO t_borrowed_book (book_id, member_id, borrow_date) VALUES (?, ?, ?) 
-            ''', (book_id, member_id, "now",))
-            cursor.execute('''
-                UPDATE t_book SET available = 0 WHERE id = ?
+        with self._writing(), self.conn:
+            # Проверка доступности и пометка выдачи - один условный UPDATE: из двух
+            # одновременных выдач одной книги строку изменит только первая.
+            cursor = self.conn.execute('''
+                UPDATE t_book SET available = 0 WHERE id = ? AND available = 1
             ''', (book_id,))
-            self.conn.commit()
-            return True
-        return False
+            if cursor.rowcount == 0:
+                return False
+            self.conn.execute('''
+                INSERT INTO t_borrowed_book (book_id, member_id, borrow_date) VALUES (?, ?, datetime('now'))
+            ''', (book_id, member_id,))
+        return True
+
+    def return_book(self, book_id: int) -> bool:
+        """
+        Записывает возврат выданной книги и снова делает ее доступной.
+        Метод возвращает False, если книга не была выдана.
+        """
+        with self._writing(), self.conn:
+            cursor = self.conn.execute('''
+                UPDATE t_borrowed_book SET return_date = datetime('now')
+                WHERE book_id = ? AND return_date IS NULL
+            ''', (book_id,))
+            if cursor.rowcount == 0:
+                return False
+            self.conn.execute('''
+                UPDATE t_book SET available = 1 WHERE id = ?
+            ''', (book_id,))
+        return True
+
+    def get_borrow_history(self, member_id: int, limit: int = 20,
+                           offset: int = 0) -> tp.List[tp.Tuple[int, int, str, str, tp.Optional[str]]]:
+        """
+        История выдач читателя, начиная с последней.
+        Метод возвращает страницу кортежей (id, book_id, title, borrow_date, return_date).
+        """
+        return self._fetchall(BORROW_HISTORY_QUERY, (member_id, limit, offset))
+
+    def get_book_history(self, book_id: int, limit: int = 20,
+                         offset: int = 0) -> tp.List[tp.Tuple[int, int, str, tp.Optional[str]]]:
+        """
+        История выдач книги, начиная с последней.
+        Метод возвращает страницу кортежей (id, member_id, borrow_date, return_date).
+        """
+        return self._fetchall(BOOK_HISTORY_QUERY, (book_id, limit, offset))
 
-        
     def search_book(self, title: str) -> tp.List[tp.Any]:
         """
         Ищем книгу (по названию) из таблицы книг
         Метод должен возвращать лист кортежей всех по названию!
         """
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id, title FROM t_book WHERE title = ?
+        return self._fetchall('''
+            SELECT id, title FROM t_book WHERE title = ? ORDER BY id
         ''', (title,))
-        book = cursor.fetchone()
-        if book == None:
-            return []
+
+    def search_books(self, query: str, limit: int = 20, offset: int = 0,
+                     fuzzy: bool = False) -> tp.List[tp.Tuple[int, str, tp.Optional[str]]]:
+        """
+        Полнотекстовый поиск книг по названию и автору.
+        По умолчанию каждое слово запроса ищется как префикс слова книги, все слова обязательны.
+        С fuzzy=True запрос разбивается на триграммы: кандидаты отбираются по FUZZY_TRIGRAMS
+        самым редким из них, и выше оказываются книги, у которых совпало больше триграмм.
+        Так находятся части слов и слова с одной опечаткой.
+        Если SQLite не поддерживает trigram, fuzzy=True ищет каждое слово как подстроку
+        названия или автора через LIKE: части слов находятся, опечатки - нет.
+        Метод возвращает страницу кортежей (id, title, author) в порядке релевантности.
+        """
+        words = re.findall(r"\w+", query.lower())
+        if fuzzy and not self.trigram:
+            return self._search_like(words, limit, offset)
+        if fuzzy:
+            table = "t_book_trigram"
+            trigrams = self._rarest_trigrams({word[i:i + 3] for word in words for i in range(len(word) - 2)})
+            match = " OR ".join(f'"{trigram}"' for trigram in trigrams)
         else:
-            return [book]
+            table = "t_book_fts"
+            match = " ".join(f'"{word}"*' for word in words)
+        if not match:
+            return []
+
+        return self._fetchall(f'''
+            SELECT b.id, b.title, a.name
+            FROM {table} f
+            JOIN t_book b ON b.id = f.rowid
+            LEFT JOIN t_author a ON a.id = b.author_id
+            WHERE {table} MATCH ?
+            ORDER BY bm25({table}, ?, 1.0), b.id
+            LIMIT ? OFFSET ?
+        ''', (match, TITLE_WEIGHT, limit, offset))
+
+    def _search_like(self, words: tp.List[str], limit: int,
+                     offset: int) -> tp.List[tp.Tuple[int, str, tp.Optional[str]]]:
+        """
+        Ищет книги, в названии или авторе которых есть все слова как подстроки. Порядок - по ID.
+        Из спецсимволов LIKE в словах может встретиться только "_", он экранируется.
+        """
+        if not words:
+            return []
+        patterns = ["%" + word.replace("_", "\\_") + "%" for word in words]
+        condition = " AND ".join(r"(b.title LIKE ? ESCAPE '\' OR a.name LIKE ? ESCAPE '\')" for _ in words)
+        return self._fetchall(f'''
+            SELECT b.id, b.title, a.name
+            FROM t_book b
+            LEFT JOIN t_author a ON a.id = b.author_id
+            WHERE {condition}
+            ORDER BY b.id
+            LIMIT ? OFFSET ?
+        ''', (*(pattern for pattern in patterns for _ in range(2)), limit, offset))
+
+    def _rarest_trigrams(self, trigrams: tp.Set[str]) -> tp.List[str]:
+        """
+        Возвращает FUZZY_TRIGRAMS самых редких триграмм по числу книг, в которых они встречаются.
+        """
+        if len(trigrams) <= FUZZY_TRIGRAMS:
+            return sorted(trigrams)
+        documents = dict(self._fetchall(f'''
+            SELECT term, doc FROM t_book_trigram_vocab WHERE term IN ({", ".join("?" * len(trigrams))})
+        ''', tuple(trigrams)))
+        return sorted(trigrams, key=lambda trigram: (documents.get(trigram, 0), trigram))[:FUZZY_TRIGRAMS]
+
+    def _bulk_insert(self, query: str, rows: tp.Iterable[tp.Any],
+                     convert: tp.Callable[[tp.Any], tp.Tuple[tp.Any, ...]], chunk_size: int) -> BulkStats:
+        """
+        Вставляет строки через executemany, по одной транзакции на chunk_size строк.
+        """
+        stats = BulkStats()
+        start = time.perf_counter()
+        cursor = self.conn.cursor()
+        for chunk in _chunks(rows, chunk_size):
+            with self._writing(), self.conn:
+                cursor.executemany(query, [convert(row) for row in chunk])
+            stats.rows += len(chunk)
+            stats.chunks += 1
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def _name_ids(self, table: str) -> tp.Dict[str, int]:
+        """
+        Загружает соответствие имя -> ID из таблицы t_author или t_genre.
+        """
+        return dict(self._fetchall(f"SELECT name, id FROM {table}"))
+
+    def _resolve(self, value: tp.Any, table: str, ids: tp.Dict[str, int]) -> tp.Optional[int]:
+        """
+        Возвращает ID по имени из словаря, при необходимости добавляя запись в таблицу.
+        Числа считаются уже готовыми ID.
+        """
+        if value is None or isinstance(value, int):
+            return value
+        if value not in ids:
+            cursor = self.conn.cursor()
+            cursor.execute(f"INSERT INTO {table} (name) VALUES (?)", (value,))
+            ids[value] = cursor.lastrowid
+        return ids[value]
+
+    def add_authors_bulk(self, names: tp.Iterable[str], chunk_size: int = BULK_CHUNK_SIZE) -> BulkStats:
+        """
+        Массово добавляет авторов в таблицу t_author.
+        Уже существующие имена пропускаются.
+        """
+        return self._bulk_insert(
+            "INSERT OR IGNORE INTO t_author (name) VALUES (?)", names, lambda name: (name,), chunk_size
+        )
+
+    def add_genres_bulk(self, names: tp.Iterable[str], chunk_size: int = BULK_CHUNK_SIZE) -> BulkStats:
+        """
+        Массово добавляет жанры в таблицу t_genre.
+        Уже существующие жанры пропускаются.
+        """
+        return self._bulk_insert(
+            "INSERT OR IGNORE INTO t_genre (name) VALUES (?)", names, lambda name: (name,), chunk_size
+        )
+
+    def add_members_bulk(self, rows: tp.Iterable[tp.Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkStats:
+        """
+        Массово добавляет читателей в таблицу t_member.
+        Строка - кортеж (name, membership_date) или словарь с такими ключами.
+        """
+        def convert(row: tp.Any) -> tp.Tuple[tp.Any, ...]:
+            if isinstance(row, dict):
+                return row["name"], row.get("membership_date") or "now"
+            name, membership_date = row
+            return name, membership_date
+
+        return self._bulk_insert(
+            "INSERT INTO t_member (name, membership_date) VALUES (?, ?)", rows, convert, chunk_size
+        )
+
+    def add_books_bulk(self, rows: tp.Iterable[tp.Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkStats:
+        """
+        Массово добавляет книги в таблицу t_book.
+        Строка - кортеж (title, author, publication_year, genre) или словарь с ключами
+        title, author или author_id, publication_year, genre или genre_id.
+        В кортеже int считается ID, а str - именем, поэтому ID из текстовых источников
+        нужно привести к int (read_rows делает это для author_id и genre_id).
+        Имена авторов и жанров переводятся в ID по словарям в памяти,
+        новые авторы и жанры добавляются в той же транзакции.
+        """
+        authors = self._name_ids("t_author")
+        genres = self._name_ids("t_genre")
+
+        def convert(row: tp.Any) -> tp.Tuple[tp.Any, ...]:
+            if isinstance(row, dict):
+                author = _to_int(row["author_id"]) if row.get("author_id") is not None else row.get("author")
+                genre = _to_int(row["genre_id"]) if row.get("genre_id") is not None else row.get("genre")
+                title, publication_year = row["title"], row.get("publication_year")
+            else:
+                title, author, publication_year, genre = row
+            return (
+                title,
+                self._resolve(author, "t_author", authors),
+                _to_int(publication_year),
+                self._resolve(genre, "t_genre", genres),
+            )
 
+        return self._bulk_insert(
+            "INSERT INTO t_book (title, author_id, publication_year, genre_id) VALUES (?, ?, ?, ?)",
+            rows, convert, chunk_size
+        )
@@ -1,5 +1,16 @@
+import io
+import sqlite3
+import threading
+
 import pytest
-from library import Library
+from library import (
+    AVAILABLE_BOOKS_QUERY,
+    BOOK_HISTORY_QUERY,
+    BOOKS_BY_AUTHOR_QUERY,
+    BORROW_HISTORY_QUERY,
+    Library,
+    read_rows,
+)
 
 
 @pytest.fixture
@@ -110,3 +121,293 @@ def test_sql_injection_in_search_book(library):
     malicious_input = "Harry Potter'; DROP TABLE t_book; --"
     result = library.search_book(malicious_input)
     assert result == [], "SQL-инъекция сработала, что недопустимо. Или выпала системная ошибка"
+
+
+def test_add_books_bulk(library):
+    """
+    Тест на массовую загрузку книг с именами авторов и жанров
+    """
+    author_id = library.add_author("J.K. Rowling")
+    rows = [
+        ("Harry Potter and the Philosopher's Stone", "J.K. Rowling", 1997, "Fantasy"),
+        ("Harry Potter and the Chamber of Secrets", author_id, 1998, "Fantasy"),
+        ("The Hobbit", "J.R.R. Tolkien", 1937, "Fantasy"),
+        ("Dune", "Frank Herbert", 1965, "Science Fiction"),
+        ("Untitled", None, None, None),
+    ]
+    stats = library.add_books_bulk(iter(rows), chunk_size=2)
+
+    assert stats.rows == 5, "Загружены не все книги."
+    assert stats.chunks == 3, "Загрузка не разбита на транзакции."
+    assert stats.rows_per_second > 0
+    assert len(library.get_books_by_author("J.K. Rowling")) == 2, "Автор не сопоставлен по имени."
+    assert len(library.get_books_by_author("J.R.R. Tolkien")) == 1, "Новый автор не добавлен."
+    assert library.add_genres_bulk(["Fantasy", "Science Fiction", "Drama"]).rows == 3
+    assert library.conn.execute("SELECT count(*) FROM t_genre").fetchone()[0] == 3, "Жанры задублировались."
+
+
+@pytest.mark.parametrize("fmt, data", [
+    ("csv", "title,author,publication_year,genre\nDune,Frank Herbert,1965,\nEmma,Jane Austen,,Novel\n"),
+    ("jsonl", '{"title": "Dune", "author": "Frank Herbert", "publication_year": 1965}\n'
+              '{"title": "Emma", "author": "Jane Austen", "genre": "Novel"}\n'),
+])
+def test_add_books_bulk_from_stream(library, fmt, data):
+    """
+    Тест на массовую загрузку книг из потока CSV/JSONL
+    """
+    stats = library.add_books_bulk(read_rows(io.StringIO(data), fmt))
+
+    assert stats.rows == 2, "Загружены не все книги."
+    books = library.conn.execute(
+        "SELECT title, publication_year, genre_id FROM t_book ORDER BY title"
+    ).fetchall()
+    assert books[0][:2] == ("Dune", 1965)
+    assert books[0][2] is None and books[1][2] is not None, "Жанр не сопоставлен."
+    assert library.get_books_by_author("Jane Austen")[0][1] == "Emma"
+
+
+def test_read_rows_ids(library):
+    """
+    Тест на разбор ID из CSV: author_id приводится к int, а цифры в author остаются именем
+    """
+    author_id = library.add_author("Frank Herbert")
+    rows = list(read_rows(io.StringIO(
+        f"title,author,author_id,publication_year\nDune,,{author_id},1965\nNumbers,42,,\n"
+    )))
+
+    assert rows[0]["author_id"] == author_id and rows[0]["publication_year"] == 1965
+    library.add_books_bulk(rows)
+    assert [book[1] for book in library.get_books_by_author("Frank Herbert")] == ["Dune"]
+    assert [book[1] for book in library.get_books_by_author("42")] == ["Numbers"], "Имя из цифр принято за ID."
+
+
+def test_add_members_bulk(library):
+    """
+    Тест на массовую загрузку читателей
+    """
+    stats = library.add_members_bulk([("John Doe", "2024-01-01"), {"name": "Jane Doe"}])
+    assert stats.rows == 2, "Загружены не все читатели."
+    assert library.conn.execute("SELECT count(*) FROM t_member").fetchone()[0] == 2
+
+
+def test_migrations(tmp_path):
+    """
+    Проверяем, что миграции применяются один раз и создают индексы
+    """
+    db_name = str(tmp_path / "library.db")
+    library = Library(db_name)
+    version = library.conn.execute("PRAGMA user_version").fetchone()[0]
+    library.conn.close()
+
+    library = Library(db_name)
+    assert library.conn.execute("PRAGMA user_version").fetchone()[0] == version
+    indexes = {row[0] for row in library.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_book_author", "idx_book_title", "idx_book_available"} <= indexes
+
+
+@pytest.mark.parametrize("query, params, index", [
+    (AVAILABLE_BOOKS_QUERY, (), "idx_book_available"),
+    (BOOKS_BY_AUTHOR_QUERY, ("J.K. Rowling",), "idx_book_author"),
+    (BORROW_HISTORY_QUERY, (1, 20, 0), "idx_borrowed_member_date"),
+    (BOOK_HISTORY_QUERY, (1, 20, 0), "idx_borrowed_book"),
+])
+def test_read_paths_use_indexes(library, query, params, index):
+    """
+    Проверяем, что запросы чтения идут по индексам и не сортируют во временном B-дереве
+    """
+    plan = library.query_plan(query, params)
+
+    assert any(index in step for step in plan), f"Запрос не использует {index}: {plan}"
+    assert not any("TEMP B-TREE" in step for step in plan), f"Запросу нужна сортировка: {plan}"
+
+
+@pytest.fixture
+def catalogue(library):
+    library.add_books_bulk([
+        ("Harry Potter and the Goblet of Fire", "J.K. Rowling", 2000, "Fantasy"),
+        ("Harry Potter and the Half-Blood Prince", "J.K. Rowling", 2005, "Fantasy"),
+        ("The Hobbit", "J.R.R. Tolkien", 1937, "Fantasy"),
+        ("Potted Plants", "Harry Smith", 1990, "Gardening"),
+    ])
+    return library
+
+
+def test_search_books_prefix(catalogue):
+    """
+    Проверяем поиск по префиксам слов названия и автора с ранжированием
+    """
+    books = catalogue.search_books("harr pot")
+    assert [book[1] for book in books[:2]] == [
+        "Harry Potter and the Goblet of Fire", "Harry Potter and the Half-Blood Prince"
+    ], "Книги с совпадением в названии должны быть выше."
+    assert books[-1][1] == "Potted Plants"
+
+    assert [book[1] for book in catalogue.search_books("tolk")] == ["The Hobbit"]
+    assert catalogue.search_books("") == []
+    assert catalogue.search_books('"; DROP TABLE t_book; --') == []
+
+
+def test_search_books_pagination(catalogue):
+    """
+    Проверяем постраничную выдачу результатов поиска
+    """
+    first = catalogue.search_books("harry", limit=2)
+    second = catalogue.search_books("harry", limit=2, offset=2)
+    assert len(first) == 2 and len(second) == 1
+    assert {book[0] for book in first}.isdisjoint(book[0] for book in second)
+
+
+def test_search_books_fuzzy(catalogue):
+    """
+    Проверяем нечеткий поиск с опечаткой
+    """
+    assert catalogue.search_books("Hobitt") == []
+    assert catalogue.search_books("Hobitt", fuzzy=True)[0][1] == "The Hobbit"
+
+
+def test_search_books_fuzzy_without_trigram(monkeypatch):
+    """
+    Проверяем, что без токенизатора trigram нечеткий поиск ищет подстроки через LIKE
+    """
+    monkeypatch.setattr("library._supports_trigram", lambda: False)
+    library = Library(":memory:")
+    library.add_books_bulk([
+        ("The Hobbit", "J.R.R. Tolkien", 1937, "Fantasy"),
+        ("snake_case", "Guido", 1991, None),
+        ("snakeXcase", "Guido", 1991, None),
+    ])
+
+    assert not library.trigram
+    assert library.search_books("obbi tolk", fuzzy=True)[0][1] == "The Hobbit"
+    assert [book[1] for book in library.search_books("e_c", fuzzy=True)] == ["snake_case"]
+    assert library.search_books("Hobbit", fuzzy=False)[0][1] == "The Hobbit"
+
+
+def test_search_index_in_sync(catalogue):
+    """
+    Проверяем, что поисковый индекс обновляется вместе с таблицами книг и авторов
+    """
+    book_id = catalogue.search_books("hobbit")[0][0]
+    with catalogue.conn:
+        catalogue.conn.execute("UPDATE t_book SET title = 'There and Back Again' WHERE id = ?", (book_id,))
+        catalogue.conn.execute("UPDATE t_author SET name = 'John Tolkien' WHERE name = 'J.R.R. Tolkien'")
+    assert catalogue.search_books("hobbit") == []
+    assert catalogue.search_books("back john") == [(book_id, "There and Back Again", "John Tolkien")]
+
+    with catalogue.conn:
+        catalogue.conn.execute("DELETE FROM t_book WHERE id = ?", (book_id,))
+    assert catalogue.search_books("back") == []
+    assert catalogue.search_books("back", fuzzy=True) == []
+
+
+def test_search_book_returns_all_matches(library):
+    """
+    Проверяем, что поиск по точному названию возвращает все книги, а не первую
+    """
+    author_id = library.add_author("J.K. Rowling")
+    library.add_book("Harry Potter", author_id, 1997)
+    library.add_book("Harry Potter", author_id, 1998)
+    assert len(library.search_book("Harry Potter")) == 2
+
+
+@pytest.fixture
+def pooled_library(tmp_path):
+    lib = Library(tmp_path / "library.db", pool_size=4)
+    yield lib
+    lib.close()
+
+
+def test_pool_mode(pooled_library):
+    """
+    Проверяем режим пула: WAL и соединения только для чтения
+    """
+    assert pooled_library.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    author_id = pooled_library.add_author("J.K. Rowling")
+    pooled_library.add_book("Harry Potter and the Goblet of Fire", author_id, 2000)
+    assert pooled_library.get_books_by_author("J.K. Rowling")[0][1] == "Harry Potter and the Goblet of Fire"
+
+    with pooled_library._reading() as conn, pytest.raises(sqlite3.OperationalError):
+        conn.execute("DELETE FROM t_book")
+
+    with pytest.raises(ValueError):
+        Library(":memory:", pool_size=4)
+
+
+def test_pool_concurrent_access(pooled_library):
+    """
+    Проверяем, что выдача и чтение из нескольких потоков не падают с блокировкой
+    """
+    author_id = pooled_library.add_author("J.K. Rowling")
+    member_id = pooled_library.add_member("John Doe")
+    pooled_library.add_books_bulk((f"Book {index}", author_id, 2000, None) for index in range(100))
+    errors = []
+
+    def work(worker):
+        try:
+            for index in range(worker, 100, 8):
+                pooled_library.borrow_book(index + 1, member_id)
+                pooled_library.get_available_books()
+        except sqlite3.Error as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert pooled_library.get_available_books() == []
+
+
+def test_return_book_and_history(library):
+    """
+    Проверяем возврат книги и историю выдач с постраничным выводом
+    """
+    author_id = library.add_author("J.K. Rowling")
+    member_id = library.add_member("John Doe")
+    book_ids = [library.add_book(f"Harry Potter {index}", author_id) for index in range(3)]
+
+    assert library.borrow_book(book_ids[0], member_id)
+    assert not library.borrow_book(book_ids[0], member_id), "Книгу выдали дважды."
+    assert library.return_book(book_ids[0])
+    assert not library.return_book(book_ids[0]), "Книгу вернули дважды."
+    assert library.borrow_book(book_ids[0], member_id), "Возвращенная книга недоступна."
+    assert library.borrow_book(book_ids[1], member_id)
+    assert not library.borrow_book(404, member_id), "Выдана несуществующая книга."
+
+    history = library.get_borrow_history(member_id, limit=2)
+    assert [row[1] for row in history] == [book_ids[1], book_ids[0]], "История не отсортирована."
+    assert history[1][4] is None
+    older = library.get_borrow_history(member_id, limit=2, offset=2)
+    assert len(older) == 1 and older[0][4] is not None, "Не найдена закрытая выдача."
+    assert len(library.get_book_history(book_ids[0])) == 2
+    assert [book[0] for book in library.get_available_books()] == [book_ids[2]]
+
+
+def test_borrow_book_concurrent(tmp_path):
+    """
+    Проверяем, что при одновременной выдаче из нескольких потоков каждая книга выдается один раз
+    """
+    db_name = str(tmp_path / "library.db")
+    library = Library(db_name)
+    author_id = library.add_author("J.K. Rowling")
+    member_ids = [library.add_member(f"Member {index}") for index in range(8)]
+    library.add_books_bulk((f"Book {index}", author_id, 2000, None) for index in range(50))
+    successes = [0] * len(member_ids)
+
+    def work(worker):
+        own = Library(db_name)
+        for book_id in range(1, 51):
+            successes[worker] += own.borrow_book(book_id, member_ids[worker])
+        own.close()
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(len(member_ids))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(successes) == 50, "Книги выданы больше одного раза."
+    counts = library.conn.execute("SELECT book_id, count(*) FROM t_borrowed_book GROUP BY book_id").fetchall()
+    assert len(counts) == 50 and all(count == 1 for _, count in counts)
@@ -0,0 +1,73 @@
+"""Замер запросов `selects.DataBaseHandler` на chinook.
+
+Каждый запрос выполняется `--repeat` раз без кеша результатов в обычном режиме и в режиме
+`optimized` (индекс по цене и триграммный индекс по названиям плейлистов). Для каждого запроса
+выводится план с отметками о полных просмотрах таблиц и сортировках во временном B-дереве (`<-`)
+и о просмотрах индекса целиком (`<~`).
+"""
+from argparse import ArgumentParser
+from collections.abc import Callable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import time
+import zipfile
+
+from selects import DataBaseHandler
+
+
+ARCHIVE = Path(__file__).parent / "chinook.zip"
+
+QUERIES: dict[str, Callable[[DataBaseHandler], object]] = {
+    "most_expensive": lambda handler: handler.get_most_expensive_track_names(10),
+    "genres": lambda handler: handler.get_tracks_of_given_genres(["Reggae", "Blues"], 15),
+    "playlist": lambda handler: handler.get_tracks_that_belong_to_playlist_found_by_name("Classical"),
+    "playlist_page": lambda handler: handler.get_playlist_tracks_page("Classical", 20, (1, 0)),
+}
+
+
+def bench(repeat: int) -> list[dict]:
+    """Замерить запросы в обычном и оптимизированном режимах."""
+    records = list()
+    with TemporaryDirectory() as directory:
+        with zipfile.ZipFile(ARCHIVE) as archive:
+            archive.extractall(directory)
+        for optimized in (False, True):
+            handler = DataBaseHandler(str(Path(directory) / "chinook.db"), cache_size=0, optimized=optimized)
+            for name, query in QUERIES.items():
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    query(handler)
+                seconds = (time.perf_counter() - start) / repeat
+
+                # Профиль одного выполнения, чтобы замер не включал EXPLAIN.
+                handler.instrument = True
+                query(handler)
+                handler.instrument = False
+                records.append({"query": name, "optimized": optimized, "seconds": seconds,
+                                "profile": handler.profiles.pop()})
+            handler.teardown()
+    return records
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Запустить замер из командной строки."""
+    parser = ArgumentParser(prog="benchmark")
+    parser.add_argument("-r", "--repeat", type=int, default=200, help="Число выполнений каждого запроса")
+    args = parser.parse_args(argv)
+
+    for record in bench(args.repeat):
+        label = "optimized" if record["optimized"] else "обычный"
+        profile = record["profile"]
+        print(f"{record['query']:>16} {label:>10}: {record['seconds'] * 1000:8.3f} мс")
+        for step in profile.plan:
+            if step in profile.table_scans or step in profile.temp_btrees:
+                flag = " <-"
+            elif step in profile.index_scans:
+                flag = " <~"
+            else:
+                flag = ""
+            print(f"{'':>30}{step}{flag}")
+
+
+if __name__ == "__main__":
+    main()
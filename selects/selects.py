@@ -1,16 +1,499 @@
 import typing as tp
+import functools
+import json
 import sqlite3
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 
 # TODO: use pypika
 
+# Size and time to live of the result cache when it is enabled with `cache_size`.
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 60.0
+# How many rows the streaming methods fetch from the cursor at once.
+STREAM_BATCH_SIZE = 500
+# How many profiles of executed queries an instrumented handler keeps.
+PROFILE_HISTORY = 1000
+
+MOST_EXPENSIVE_TRACKS_QUERY = '''
+    SELECT Name
+    FROM tracks
+    ORDER BY UnitPrice DESC, TrackId ASC
+    LIMIT ?
+'''
+
+# Genres come as one JSON array, so the SQL text is the same for lists of any length.
+TRACKS_OF_GENRES_QUERY = '''
+    SELECT t.Name
+    FROM tracks t
+    JOIN genres g ON t.GenreId = g.GenreId
+    WHERE g.Name IN (SELECT value FROM json_each(?))
+    ORDER BY t.Milliseconds ASC
+    LIMIT ?
+'''
+
+# Rows come in (TrackId, PlaylistId) order in both modes.
+PLAYLIST_TRACKS_QUERY = '''
+    SELECT t.Name AS track_name, p.Name AS playlist_name
+    FROM tracks t
+    JOIN playlist_track pt ON t.TrackId = pt.TrackId
+    JOIN playlists p ON pt.PlaylistId = p.PlaylistId
+    WHERE p.Name LIKE ?
+    ORDER BY t.TrackId, pt.PlaylistId
+'''
+
+# Keyset pages: the rows after the key of the previous page, the key columns come last.
+# ?1.. are the filter parameters, then the key of the previous page and the page size.
+MOST_EXPENSIVE_TRACKS_PAGE_QUERY = '''
+    SELECT Name, UnitPrice, TrackId
+    FROM tracks
+    WHERE UnitPrice < ?1 OR (UnitPrice = ?1 AND TrackId > ?2)
+    ORDER BY UnitPrice DESC, TrackId ASC
+    LIMIT ?3
+'''
+
+TRACKS_OF_GENRES_PAGE_QUERY = '''
+    SELECT t.Name, t.Milliseconds, t.TrackId
+    FROM tracks t
+    JOIN genres g ON t.GenreId = g.GenreId
+    WHERE g.Name IN (SELECT value FROM json_each(?1))
+        AND (t.Milliseconds > ?2 OR (t.Milliseconds = ?2 AND t.TrackId > ?3))
+    ORDER BY t.Milliseconds ASC, t.TrackId ASC
+    LIMIT ?4
+'''
+
+PLAYLIST_TRACKS_PAGE_QUERY = '''
+    SELECT t.Name AS track_name, p.Name AS playlist_name, pt.PlaylistId, pt.TrackId
+    FROM tracks t
+    JOIN playlist_track pt ON t.TrackId = pt.TrackId
+    JOIN playlists p ON pt.PlaylistId = p.PlaylistId
+    WHERE p.Name LIKE ?1 AND (pt.PlaylistId > ?2 OR (pt.PlaylistId = ?2 AND pt.TrackId > ?3))
+    ORDER BY pt.PlaylistId ASC, pt.TrackId ASC
+    LIMIT ?4
+'''
+
+# Supporting indexes and the trigram index over playlist names for the optimized mode.
+# playlist_track(PlaylistId, TrackId) is its primary key and already has an index.
+# DESC in an index works only in the schema format 4 (chinook.db is in the legacy format 1).
+DESC_INDEX_SCHEMA_FORMAT = 4
+# Statements of optimize and drop_optimizations. They are run one by one inside one transaction:
+# executescript commits on its own and would leave a half-applied schema behind on a failure.
+PRICE_INDEX_STATEMENTS = (
+    'CREATE INDEX IF NOT EXISTS idx_tracks_price ON tracks (UnitPrice DESC, TrackId)',
+)
+TRIGRAM_STATEMENTS = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS playlists_trigram USING fts5(
+        Name, content='playlists', content_rowid='PlaylistId', tokenize='trigram'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS playlists_trigram_insert AFTER INSERT ON playlists BEGIN
+        INSERT INTO playlists_trigram (rowid, Name) VALUES (new.PlaylistId, new.Name);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS playlists_trigram_delete AFTER DELETE ON playlists BEGIN
+        INSERT INTO playlists_trigram (playlists_trigram, rowid, Name) VALUES ('delete', old.PlaylistId, old.Name);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS playlists_trigram_update AFTER UPDATE ON playlists BEGIN
+        INSERT INTO playlists_trigram (playlists_trigram, rowid, Name) VALUES ('delete', old.PlaylistId, old.Name);
+        INSERT INTO playlists_trigram (rowid, Name) VALUES (new.PlaylistId, new.Name);
+    END''',
+)
+
+# Statistics of the dropped index are removed by SQLite itself.
+DROP_OPTIMIZE_STATEMENTS = (
+    'DROP TRIGGER IF EXISTS playlists_trigram_insert',
+    'DROP TRIGGER IF EXISTS playlists_trigram_delete',
+    'DROP TRIGGER IF EXISTS playlists_trigram_update',
+    'DROP TABLE IF EXISTS playlists_trigram',
+    'DROP INDEX IF EXISTS idx_tracks_price',
+)
+
+# In the optimized mode playlists are found by the trigram index, which supports the same LIKE,
+# and their tracks are read by the playlist_track primary key.
+# CROSS JOIN keeps the trigram index as the outer loop instead of a scan over all the tracks.
+# The matched rows are sorted into the order of the plain query in a temporary B-tree.
+OPTIMIZED_PLAYLIST_TRACKS_QUERY = '''
+    SELECT t.Name AS track_name, p.Name AS playlist_name
+    FROM playlists_trigram f
+    CROSS JOIN playlists p ON p.PlaylistId = f.rowid
+    CROSS JOIN playlist_track pt ON pt.PlaylistId = p.PlaylistId
+    CROSS JOIN tracks t ON t.TrackId = pt.TrackId
+    WHERE f.Name LIKE ?
+    ORDER BY t.TrackId, pt.PlaylistId
+'''
+
+# The matched tracks are sorted in a temporary B-tree: the trigram index can not give the order
+# together with playlist_track, but that is cheaper than walking playlist_track from the key.
+OPTIMIZED_PLAYLIST_TRACKS_PAGE_QUERY = '''
+    SELECT t.Name AS track_name, p.Name AS playlist_name, pt.PlaylistId, pt.TrackId
+    FROM playlists_trigram f
+    CROSS JOIN playlists p ON p.PlaylistId = f.rowid
+    CROSS JOIN playlist_track pt ON pt.PlaylistId = p.PlaylistId
+    CROSS JOIN tracks t ON t.TrackId = pt.TrackId
+    WHERE f.Name LIKE ?1 AND f.rowid >= ?2
+        AND (pt.PlaylistId > ?2 OR (pt.PlaylistId = ?2 AND pt.TrackId > ?3))
+    ORDER BY pt.PlaylistId ASC, pt.TrackId ASC
+    LIMIT ?4
+'''
+
+Row = tuple[tp.Any, ...]
+Key = tuple[tp.Any, ...]
+CacheKey = tuple[str, tuple[tp.Any, ...]]
+
+
+@dataclass
+class Page:
+    """
+    One page of a keyset pagination.
+    next_key is passed as `after` to get the next page, None on the last page
+    """
+    rows: list[Row]
+    next_key: Key | None = None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+@dataclass
+class QueryProfile:
+    """
+    Execution of one query: its plan from EXPLAIN QUERY PLAN and the time spent reading the rows
+    """
+    query: str
+    params: tuple[tp.Any, ...]
+    plan: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+    rows: int = 0
+
+    @property
+    def table_scans(self) -> list[str]:
+        """
+        Steps that read a whole table without an index, at any nesting depth
+        """
+        return [
+            step for step in self.plan
+            if step.lstrip().startswith("SCAN ") and " USING " not in step and "VIRTUAL TABLE" not in step
+        ]
+
+    @property
+    def index_scans(self) -> list[str]:
+        """
+        Steps that walk a whole index, at any nesting depth. They are not flagged:
+        with ORDER BY on the index and a LIMIT such a scan stops after the first rows
+        """
+        return [step for step in self.plan if step.lstrip().startswith("SCAN ") and " USING " in step]
+
+    @property
+    def temp_btrees(self) -> list[str]:
+        """
+        Steps that sort or deduplicate rows in a temporary B-tree
+        """
+        return [step for step in self.plan if "TEMP B-TREE" in step]
+
+    @property
+    def flagged(self) -> bool:
+        return bool(self.table_scans or self.temp_btrees)
+
+
+@functools.cache
+def _supports_trigram() -> bool:
+    """
+    Whether this SQLite build has the FTS5 trigram tokenizer (SQLite 3.34+). Checked once, on first use
+    :return:
+    """
+    connection = sqlite3.connect(":memory:")
+    try:
+        connection.execute("CREATE VIRTUAL TABLE probe USING fts5(text, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+
+
+def explain(connection: sqlite3.Connection, query: str, params: tuple[tp.Any, ...] = ()) -> list[str]:
+    """
+    Steps of EXPLAIN QUERY PLAN, nested steps are indented
+    :param connection:
+    :param query: SQL text with placeholders
+    :param params: query parameters
+    :return:
+    """
+    depth: dict[int, int] = {0: -1}
+    plan = list()
+    for id_, parent, _, detail in connection.execute(f"EXPLAIN QUERY PLAN {query}", params):
+        depth[id_] = depth.get(parent, -1) + 1
+        plan.append("  " * depth[id_] + detail)
+    return plan
+
+
+class ResultCache:
+    """
+    LRU cache of query results with a time to live.
+    Entries are stamped with the database version they were read at and are dropped
+    as soon as the version changes.
+    """
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL,
+                 clock: tp.Callable[[], float] = time.monotonic):
+        """
+        :param maxsize: how many results to keep, 0 disables the cache
+        :param ttl: how many seconds a result stays valid
+        :param clock: source of time in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries: OrderedDict[CacheKey, tuple[float, list[Row]]] = OrderedDict()
+        self._version: tp.Hashable = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def validate(self, version: tp.Hashable) -> None:
+        """
+        Drop every entry if the database changed since the entries were read
+        :param version: current version of the database
+        """
+        if version != self._version:
+            if self._entries:
+                self.stats.invalidations += 1
+                self._entries.clear()
+            self._version = version
+
+    def get(self, key: CacheKey) -> list[Row] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        expires, rows = entry
+        if expires <= self.clock():
+            del self._entries[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return rows
+
+    def put(self, key: CacheKey, rows: list[Row]) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (self.clock() + self.ttl, rows)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def canonical_genres(genres: tp.Iterable[str]) -> str:
+    """
+    Genre list as a JSON array without duplicates in a fixed order,
+    so that equal lists share both the SQL text and the cache key
+    """
+    return json.dumps(sorted(set(genres)), ensure_ascii=False)
+
+
 class DataBaseHandler:
-    def __init__(self, sqlite_database_name: str):
+    def __init__(self, sqlite_database_name: str, cache_size: int = 0,
+                 cache_ttl: float = RESULT_CACHE_TTL, optimized: bool = False, instrument: bool = False):
         """
         Initialize all the context for working with database here
         :param sqlite_database_name: path to the sqlite3 database file
+        :param cache_size: how many query results to cache, 0 (the default) disables the cache.
+            A cached result is returned until it expires or the database changes, see ResultCache
+        :param cache_ttl: how many seconds a cached result stays valid
+        :param optimized: create supporting indexes in the database and use them
+        :param instrument: record the plan and the execution time of every executed query in `profiles`
         """
+        # The default statement cache of the connection (128) already holds every query of the handler.
         self.connection = sqlite3.connect(sqlite_database_name)
         self.cursor = self.connection.cursor()
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self.instrument = instrument
+        self.profiles: deque[QueryProfile] = deque(maxlen=PROFILE_HISTORY)
+        self.playlist_tracks_query = PLAYLIST_TRACKS_QUERY
+        self.playlist_tracks_page_query = PLAYLIST_TRACKS_PAGE_QUERY
+        if optimized:
+            self.optimize()
+
+    def optimize(self) -> None:
+        """
+        Create the supporting indexes if they are missing and switch the playlist queries to the trigram index.
+        The database file is changed permanently:
+        a file older than schema format 4 is rewritten by VACUUM, since DESC indexes need that format;
+        index idx_tracks_price, FTS5 table playlists_trigram and three triggers on playlists
+        that keep it in sync are created;
+        ANALYZE collects planner statistics, only when the indexes are created.
+        The schema changes are made in one transaction, so a failure leaves none of them behind.
+        Without the trigram tokenizer only the price index is created and the playlist queries stay plain.
+        drop_optimizations removes the index, the table and the triggers. The file format is kept,
+        every SQLite since 3.3.0 reads it.
+        :return:
+        """
+        if self._schema_format() < DESC_INDEX_SCHEMA_FORMAT:
+            # VACUUM rewrites the file in the current format.
+            self.cursor.execute("VACUUM")
+        trigram = _supports_trigram()
+        wanted = {"idx_tracks_price", "playlists_trigram"} if trigram else {"idx_tracks_price"}
+        existing = {name for (name,) in self.cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN ('idx_tracks_price', 'playlists_trigram')"
+        )}
+        self._run_in_transaction(
+            *PRICE_INDEX_STATEMENTS,
+            *(TRIGRAM_STATEMENTS if trigram else ()),
+            *(["INSERT INTO playlists_trigram (playlists_trigram) VALUES ('rebuild')"]
+              if trigram and "playlists_trigram" not in existing else []),
+            *(["ANALYZE"] if not wanted <= existing else []),
+        )
+        if trigram:
+            self.playlist_tracks_query = OPTIMIZED_PLAYLIST_TRACKS_QUERY
+            self.playlist_tracks_page_query = OPTIMIZED_PLAYLIST_TRACKS_PAGE_QUERY
+
+    def drop_optimizations(self) -> None:
+        """
+        Drop the index, the trigram table and the triggers created by optimize and switch back to the plain queries
+        :return:
+        """
+        self._run_in_transaction(*DROP_OPTIMIZE_STATEMENTS)
+        self.playlist_tracks_query = PLAYLIST_TRACKS_QUERY
+        self.playlist_tracks_page_query = PLAYLIST_TRACKS_PAGE_QUERY
+
+    def _run_in_transaction(self, *statements: str) -> None:
+        """
+        Run the statements one by one in one explicit transaction, roll it back on any error
+        """
+        self.cursor.execute("BEGIN")
+        try:
+            for statement in statements:
+                self.cursor.execute(statement)
+        except BaseException:
+            self.connection.rollback()
+            raise
+        self.connection.commit()
+
+    def _schema_format(self) -> int:
+        """
+        Schema format number from the header of the database file
+        """
+        (_, _, path), *_ = self.cursor.execute("PRAGMA database_list").fetchall()
+        if not path:
+            return DESC_INDEX_SCHEMA_FORMAT
+        with open(path, "rb") as file:
+            file.seek(44)
+            return int.from_bytes(file.read(4), "big")
+
+    def _profile(self, query: str, params: tuple[tp.Any, ...]) -> QueryProfile | None:
+        """
+        Start the profile of the query if the handler is instrumented
+        """
+        if not self.instrument:
+            return None
+        profile = QueryProfile(query, params, explain(self.connection, query, params))
+        self.profiles.append(profile)
+        return profile
+
+    def _data_version(self) -> tuple[int, int]:
+        """
+        Version of the database: data_version changes on commits of other connections,
+        total_changes on writes through this one
+        """
+        (version,) = self.cursor.execute("PRAGMA data_version").fetchone()
+        return version, self.connection.total_changes
+
+    def _query(self, query: str, params: tuple[tp.Any, ...]) -> list[Row]:
+        """
+        Run the query through the result cache.
+        The SQL text must not depend on the parameters, so the connection reuses the compiled statement
+        :param query: SQL text with placeholders
+        :param params: query parameters
+        :return: all the rows of the result
+        """
+        key = (query, params)
+        if self.cache.maxsize > 0:
+            self.cache.validate(self._data_version())
+            rows = self.cache.get(key)
+            if rows is not None:
+                return list(rows)
+
+        profile = self._profile(query, params)
+        start = time.perf_counter()
+        self.cursor.execute(query, params)
+        rows = self.cursor.fetchall()
+        if profile is not None:
+            profile.seconds = time.perf_counter() - start
+            profile.rows = len(rows)
+        self.cache.put(key, rows)
+        return list(rows)
+
+    def _stream(self, query: str, params: tuple[tp.Any, ...], batch_size: int) -> tp.Iterator[Row]:
+        """
+        Yield the rows of the query reading them from a separate cursor by batch_size at a time,
+        so only one batch is held in memory. The result cache is not used
+        :param query: SQL text with placeholders
+        :param params: query parameters
+        :param batch_size: how many rows to fetch at once
+        :return:
+        """
+        profile = self._profile(query, params)
+        cursor = self.connection.cursor()
+        try:
+            # Time the reading only, not the consumer of the rows.
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            while rows := cursor.fetchmany(batch_size):
+                if profile is not None:
+                    profile.seconds += time.perf_counter() - start
+                    profile.rows += len(rows)
+                yield from rows
+                start = time.perf_counter()
+        finally:
+            cursor.close()
+
+    def _page(self, query: str, params: tuple[tp.Any, ...], limit: int, key_size: int) -> Page:
+        """
+        Read one keyset page: one row more than needed shows whether there is a next page
+        :param query: SQL text with the key columns last and the page size as the last parameter
+        :param params: query parameters without the page size
+        :param limit: page size, at least 1
+        :param key_size: how many trailing columns form the key
+        :raises ValueError: if limit is less than 1
+        :return:
+        """
+        if limit < 1:
+            raise ValueError(f"Page size must be at least 1, got {limit}")
+        rows = self._query(query, (*params, limit + 1))
+        page = Page([row[:-key_size] for row in rows[:limit]])
+        if len(rows) > limit:
+            page.next_key = rows[limit - 1][-key_size:]
+        return page
+
+    def flagged_profiles(self) -> list[QueryProfile]:
+        """
+        Recorded queries that scan a whole table or sort in a temporary B-tree
+        :return:
+        """
+        return [profile for profile in self.profiles if profile.flagged]
+
+    def cache_stats(self) -> CacheStats:
+        """
+        Counters of the result cache
+        :return:
+        """
+        return self.cache.stats
 
     def get_most_expensive_track_names(self, number_of_tracks: int) -> tp.Sequence[tuple[str]]:
         """
@@ -20,14 +503,7 @@ class DataBaseHandler:
         keywords: SELECT, ORDER BY, LIMIT
         :return:
         """
-        self.cursor.execute('''
-            SELECT Name
-            FROM tracks
-            ORDER BY UnitPrice DESC, TrackId ASC
-            LIMIT ?
-        ''', (number_of_tracks,))
-        result = self.cursor.fetchall()
-        return result
+        return self._query(MOST_EXPENSIVE_TRACKS_QUERY, (number_of_tracks,))
 
     def get_tracks_of_given_genres(self, genres: tp.Sequence[str], number_of_tracks: int) -> tp.Sequence[tuple[str]]:
         """
@@ -38,18 +514,7 @@ class DataBaseHandler:
         keywords: JOIN, WHERE, IN
         :return:
         """
-        placeholders = ", ".join(["?"] * len(genres))
-        query = f'''
-            SELECT t.Name
-            FROM tracks t
-            JOIN genres g ON t.GenreId = g.GenreId
-            WHERE g.Name IN ({placeholders})
-            ORDER BY t.Milliseconds ASC
-            LIMIT ?
-        '''
-        self.cursor.execute(query, (*genres, number_of_tracks))
-        result = self.cursor.fetchall()
-        return result
+        return self._query(TRACKS_OF_GENRES_QUERY, (canonical_genres(genres), number_of_tracks))
 
     def get_tracks_that_belong_to_playlist_found_by_name(self, name_needle: str) -> tp.Sequence[tuple[str, str]]:
         """
@@ -61,16 +526,72 @@ class DataBaseHandler:
         keywords: JOIN, WHERE, LIKE
         :return:
         """
-        query = '''
-            SELECT t.Name AS track_name, p.Name AS playlist_name
-            FROM tracks t
-            JOIN playlist_track pt ON t.TrackId = pt.TrackId
-            JOIN playlists p ON pt.PlaylistId = p.PlaylistId
-            WHERE p.Name LIKE ?
-        '''
-        self.cursor.execute(query, (f"%{name_needle}%",))
-        result = self.cursor.fetchall()
-        return result
+        return self._query(self.playlist_tracks_query, (f"%{name_needle}%",))
+
+    def iter_most_expensive_track_names(self, number_of_tracks: int = -1,
+                                        batch_size: int = STREAM_BATCH_SIZE) -> tp.Iterator[tuple[str]]:
+        """
+        Same as get_most_expensive_track_names, but stream the rows
+        :param number_of_tracks: how many track names should be returned, -1 for all of them
+        :param batch_size: how many rows to fetch at once
+        :return:
+        """
+        return self._stream(MOST_EXPENSIVE_TRACKS_QUERY, (number_of_tracks,), batch_size)
+
+    def iter_tracks_of_given_genres(self, genres: tp.Sequence[str], number_of_tracks: int = -1,
+                                    batch_size: int = STREAM_BATCH_SIZE) -> tp.Iterator[tuple[str]]:
+        """
+        Same as get_tracks_of_given_genres, but stream the rows
+        :param genres:
+        :param number_of_tracks: how many track names should be returned, -1 for all of them
+        :param batch_size: how many rows to fetch at once
+        :return:
+        """
+        return self._stream(TRACKS_OF_GENRES_QUERY, (canonical_genres(genres), number_of_tracks), batch_size)
+
+    def iter_tracks_that_belong_to_playlist_found_by_name(
+            self, name_needle: str, batch_size: int = STREAM_BATCH_SIZE) -> tp.Iterator[tuple[str, str]]:
+        """
+        Same as get_tracks_that_belong_to_playlist_found_by_name, but stream the rows
+        :param name_needle:
+        :param batch_size: how many rows to fetch at once
+        :return:
+        """
+        return self._stream(self.playlist_tracks_query, (f"%{name_needle}%",), batch_size)
+
+    def get_most_expensive_tracks_page(self, limit: int, after: Key | None = None) -> Page:
+        """
+        Page of track names sorted by UnitPrice descending, then by TrackId ascending
+        :param limit: page size, at least 1
+        :param after: next_key of the previous page, None for the first page
+        :return: page of (name,) rows, the key is (UnitPrice, TrackId)
+        """
+        price, track_id = after or (float("inf"), 0)
+        return self._page(MOST_EXPENSIVE_TRACKS_PAGE_QUERY, (price, track_id), limit, 2)
+
+    def get_tracks_of_given_genres_page(self, genres: tp.Sequence[str], limit: int,
+                                        after: Key | None = None) -> Page:
+        """
+        Page of track names that have one of the given genres sorted by duration, then by TrackId
+        :param genres:
+        :param limit: page size, at least 1
+        :param after: next_key of the previous page, None for the first page
+        :return: page of (name,) rows, the key is (Milliseconds, TrackId)
+        """
+        milliseconds, track_id = after or (-1, 0)
+        return self._page(TRACKS_OF_GENRES_PAGE_QUERY, (canonical_genres(genres), milliseconds, track_id), limit, 2)
+
+    def get_playlist_tracks_page(self, name_needle: str, limit: int, after: Key | None = None) -> Page:
+        """
+        Page of track names and playlist names for playlists whose name contains `name_needle`,
+        sorted by PlaylistId, then by TrackId
+        :param name_needle:
+        :param limit: page size, at least 1
+        :param after: next_key of the previous page, None for the first page
+        :return: page of (track_name, playlist_name) rows, the key is (PlaylistId, TrackId)
+        """
+        playlist_id, track_id = after or (0, 0)
+        return self._page(self.playlist_tracks_page_query, (f"%{name_needle}%", playlist_id, track_id), limit, 2)
 
     def teardown(self) -> None:
         """
@@ -78,4 +599,5 @@ class DataBaseHandler:
         Do anything that may be needed or leave blank
         :return:
         """
+        self.cache.clear()
         self.connection.close()
@@ -1,3 +1,4 @@
+import sqlite3
 import zipfile
 from dataclasses import dataclass
 from pathlib import Path
@@ -5,7 +6,8 @@ import typing as tp
 
 import pytest
 
-from selects import DataBaseHandler
+import selects
+from selects import RESULT_CACHE_SIZE, DataBaseHandler, QueryProfile, explain
 
 
 @pytest.fixture(scope="session")
@@ -22,6 +24,13 @@ def handler() -> tp.Generator[DataBaseHandler, None, None]:
             db_path.unlink()
 
 
+@pytest.fixture
+def database(tmp_path: Path) -> Path:
+    with zipfile.ZipFile(Path(__file__).parent / 'chinook.zip', 'r') as zip_ref:
+        zip_ref.extractall(tmp_path)
+    return tmp_path / 'chinook.db'
+
+
 @dataclass
 class TrackByTypes:
     media_types: tp.Sequence[str]
@@ -93,3 +102,181 @@ def test_track_by_type(handler: DataBaseHandler, case: TrackByTypes) -> None:
 def test_track_by_playlist_name(handler: DataBaseHandler, case: TracksByPlaylistName) -> None:
     result = handler.get_tracks_that_belong_to_playlist_found_by_name(case.name_needle)
     assert result == case.results
+
+
+def test_result_cache(database: Path) -> None:
+    uncached = DataBaseHandler(str(database))
+    uncached.get_most_expensive_track_names(1)
+    uncached.get_most_expensive_track_names(1)
+    assert uncached.cache_stats().hits == 0, "Кеш результатов должен включаться явно"
+    uncached.teardown()
+
+    handler = DataBaseHandler(str(database), cache_size=RESULT_CACHE_SIZE)
+    try:
+        first = handler.get_tracks_of_given_genres(['Reggae', 'Blues'], 15)
+        first.clear()
+        assert handler.get_tracks_of_given_genres(['Blues', 'Reggae', 'Blues'], 15) == TrackByGenresCases[1].results
+        assert handler.cache_stats().hits == 1
+
+        with sqlite3.connect(database) as other:
+            other.execute("UPDATE tracks SET Name = 'Renamed' WHERE TrackId = 1")
+        assert handler.get_most_expensive_track_names(1) == [('Battlestar Galactica: The Story So Far',)]
+        assert handler.get_tracks_of_given_genres(['Reggae', 'Blues'], 15) == TrackByGenresCases[1].results
+        stats = handler.cache_stats()
+        assert (stats.hits, stats.misses, stats.invalidations) == (1, 3, 1)
+    finally:
+        handler.teardown()
+
+
+def test_result_cache_eviction(database: Path) -> None:
+    now = [0.0]
+    handler = DataBaseHandler(str(database), cache_size=1, cache_ttl=10)
+    handler.cache.clock = lambda: now[0]
+    try:
+        handler.get_most_expensive_track_names(1)
+        handler.get_most_expensive_track_names(2)
+        handler.get_most_expensive_track_names(2)
+        now[0] = 10
+        handler.get_most_expensive_track_names(2)
+        stats = handler.cache_stats()
+        assert (stats.hits, stats.misses, stats.evictions, stats.expirations) == (1, 3, 1, 1)
+    finally:
+        handler.teardown()
+
+
+def test_streaming(handler: DataBaseHandler) -> None:
+    tracks = handler.iter_tracks_that_belong_to_playlist_found_by_name('Metal', batch_size=4)
+    assert next(tracks) == TracksPlaylistsCases[0].results[0]
+    assert [next(tracks), *tracks] == TracksPlaylistsCases[0].results[1:]
+    assert list(handler.iter_tracks_of_given_genres(['Metal'], 10, batch_size=3)) == TrackByGenresCases[0].results
+    assert sum(1 for _ in handler.iter_most_expensive_track_names(batch_size=100)) == 3503
+
+
+def test_keyset_pagination(handler: DataBaseHandler) -> None:
+    def read(get_page: tp.Callable[..., tp.Any]) -> list[tuple]:
+        rows, page = [], get_page(None)
+        rows.extend(page.rows)
+        while page.next_key is not None:
+            page = get_page(page.next_key)
+            assert page.rows
+            rows.extend(page.rows)
+        return rows
+
+    assert read(lambda after: handler.get_most_expensive_tracks_page(3, after))[:10] == \
+        handler.get_most_expensive_track_names(10)
+    assert read(lambda after: handler.get_tracks_of_given_genres_page(['Metal'], 7, after))[:10] == \
+        TrackByGenresCases[0].results
+    # Pages come in (PlaylistId, TrackId) order, the plain query has no ORDER BY.
+    assert sorted(read(lambda after: handler.get_playlist_tracks_page('Classical 101', 10, after))) == \
+        sorted(TracksPlaylistsCases[1].results)
+
+    for limit in (0, -1):
+        with pytest.raises(ValueError):
+            handler.get_most_expensive_tracks_page(limit)
+
+
+def test_query_plan_instrumentation(database: Path) -> None:
+    handler = DataBaseHandler(str(database), cache_size=RESULT_CACHE_SIZE, instrument=True)
+    try:
+        handler.get_most_expensive_track_names(10)
+        handler.get_most_expensive_track_names(10)
+        list(handler.iter_tracks_that_belong_to_playlist_found_by_name('Metal', batch_size=5))
+        assert len(handler.profiles) == 2, "Ответ из кеша не должен профилироваться"
+
+        expensive, playlist = handler.profiles
+        assert expensive.table_scans == ['SCAN tracks'] and expensive.temp_btrees
+        assert playlist.rows == 26 and playlist.seconds > 0
+        assert handler.flagged_profiles() == [expensive, playlist]
+    finally:
+        handler.teardown()
+
+
+def test_nested_table_scans(database: Path) -> None:
+    query = 'SELECT Name FROM tracks UNION ALL SELECT Name FROM genres UNION ALL SELECT Title FROM albums'
+    connection = sqlite3.connect(database)
+    try:
+        profile = QueryProfile(query, (), explain(connection, query))
+    finally:
+        connection.close()
+
+    assert [step.strip() for step in profile.table_scans] == ['SCAN tracks', 'SCAN genres', 'SCAN albums']
+    assert all(step.startswith('  ') for step in profile.table_scans), "Вложенные шаги должны сохранять отступ"
+    assert profile.flagged and profile.index_scans == []
+
+
+def test_index_scans(database: Path) -> None:
+    handler = DataBaseHandler(str(database), optimized=True, instrument=True)
+    try:
+        handler.get_most_expensive_track_names(10)
+        (profile,) = handler.profiles
+        assert profile.index_scans == ['SCAN tracks USING INDEX idx_tracks_price']
+        assert profile.table_scans == [] and not profile.flagged
+    finally:
+        handler.teardown()
+
+
+def test_optimized_mode(database: Path) -> None:
+    DataBaseHandler(str(database), optimized=True).teardown()
+    handler = DataBaseHandler(str(database), cache_size=0, optimized=True, instrument=True)
+    try:
+        test_most_expensive_tracks(handler)
+        for case in TracksPlaylistsCases:
+            assert handler.get_tracks_that_belong_to_playlist_found_by_name(case.name_needle) == case.results
+        # The only sort left is the one that puts playlist tracks into the order of the plain mode.
+        expensive, *playlists = handler.profiles
+        assert not expensive.flagged, expensive.plan
+        assert not any(profile.table_scans for profile in playlists), [profile.plan for profile in playlists]
+
+        page = handler.get_playlist_tracks_page('Classical 101', 30)
+        page = handler.get_playlist_tracks_page('Classical 101', 50, page.next_key)
+        assert page.next_key is None and len(page.rows) == 45
+    finally:
+        handler.teardown()
+
+
+def test_optimized_mode_schema(database: Path) -> None:
+    DataBaseHandler(str(database), optimized=True).teardown()
+    connection = sqlite3.connect(database)
+    with connection:
+        connection.execute("DELETE FROM sqlite_stat1")
+    connection.close()
+
+    handler = DataBaseHandler(str(database), cache_size=0, optimized=True)
+    try:
+        assert handler.cursor.execute("SELECT count(*) FROM sqlite_stat1").fetchone() == (0,), \
+            "ANALYZE должен выполняться только при создании индексов"
+
+        handler.drop_optimizations()
+        assert handler.cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name LIKE '%trigram%' OR name = 'idx_tracks_price'"
+        ).fetchall() == []
+        assert handler.get_tracks_that_belong_to_playlist_found_by_name('Classical 101') == \
+            TracksPlaylistsCases[1].results
+    finally:
+        handler.teardown()
+
+
+def test_optimized_mode_atomic(database: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('selects.TRIGRAM_STATEMENTS', (*selects.TRIGRAM_STATEMENTS, 'CREATE BROKEN'))
+    with pytest.raises(sqlite3.OperationalError):
+        DataBaseHandler(str(database), optimized=True)
+
+    connection = sqlite3.connect(database)
+    try:
+        assert connection.execute(
+            "SELECT name FROM sqlite_master WHERE name LIKE '%trigram%' OR name = 'idx_tracks_price'"
+        ).fetchall() == [], "Неудачная оптимизация не должна оставлять часть схемы"
+    finally:
+        connection.close()
+
+
+def test_optimized_mode_without_trigram(database: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('selects._supports_trigram', lambda: False)
+    handler = DataBaseHandler(str(database), optimized=True)
+    try:
+        names = {name for (name,) in handler.cursor.execute("SELECT name FROM sqlite_master")}
+        assert 'idx_tracks_price' in names and 'playlists_trigram' not in names
+        assert handler.playlist_tracks_query == selects.PLAYLIST_TRACKS_QUERY
+        assert handler.get_tracks_that_belong_to_playlist_found_by_name('Metal') == TracksPlaylistsCases[0].results
+    finally:
+        handler.teardown()
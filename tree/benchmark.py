@@ -0,0 +1,98 @@
+"""Микро-замер фильтра `--extension`.
+
+Сравнивает прежнюю проверку (разбор имени через `Path`, `is_dir` на каждый элемент и сборка
+множества расширений на каждую директорию) со скомпилированным `tree.ExtensionMatcher`
+на синтетическом дереве имен. С `--path` дополнительно замеряется обход реального дерева.
+"""
+from argparse import ArgumentParser
+from collections.abc import Callable
+from pathlib import Path
+import random
+import time
+
+from tree import ExtensionMatcher, Walker, prune_entries
+
+
+SUFFIXES = ["py", "txt", "md", "tar.gz", "min.js", "json", "cpp", "hpp", ""]
+
+
+def synthetic_tree(size: int, per_directory: int = 100, seed: int = 0) -> list[list[str]]:
+    """Имена файлов синтетического дерева, разбитые по директориям."""
+    rng = random.Random(seed)
+    names = [
+        f"file_{index}.{suffix}" if suffix else f"file_{index}"
+        for index, suffix in ((index, rng.choice(SUFFIXES)) for index in range(size))
+    ]
+    return [names[start:start + per_directory] for start in range(0, size, per_directory)]
+
+
+def legacy_extension(path: Path) -> str:
+    """Прежний `get_extension`: разбор имени и `is_dir` на каждый вызов."""
+    parts = path.name.split('.')
+    if len(parts) > 2 and not path.is_dir():
+        return '.'.join(parts[-2:])
+    return path.suffix.lstrip('.')
+
+
+def run_legacy(directories: list[list[str]], extension: list[set[str]]) -> int:
+    """Фильтрация как до компиляции фильтра: два вызова на элемент и множество на директорию."""
+    matched = 0
+    for names in directories:
+        all_extensions = set().union(*extension)
+        for name in names:
+            path = Path(name)
+            if legacy_extension(path) in all_extensions:
+                matched += 1
+            legacy_extension(path)
+    return matched
+
+
+def run_matcher(directories: list[list[str]], extension: list[set[str]]) -> int:
+    """Фильтрация скомпилированным фильтром."""
+    matcher = ExtensionMatcher(set().union(*extension))
+    return sum(matcher(name) for names in directories for name in names)
+
+
+def run_walk(path: Path, extension: list[set[str]]) -> int:
+    """Обход реального дерева с фильтром."""
+    matcher = ExtensionMatcher(set().union(*extension))
+    return sum(1 for _ in prune_entries(Walker().walk(path), matcher))
+
+
+def _timed(func: Callable[[], int]) -> tuple[int, float]:
+    """Результат и время выполнения функции в секундах."""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Запустить замер из командной строки."""
+    parser = ArgumentParser(prog="benchmark")
+    parser.add_argument("-s", "--size", type=int, default=1_000_000, help="Число файлов в дереве")
+    parser.add_argument(
+        "-e", "--extension",
+        action="append",
+        default=None,
+        help="Фильтр, как у `tree -e` (по умолчанию: py,tar.gz)"
+    )
+    parser.add_argument("--path", type=Path, default=None, help="Реальное дерево для замера обхода")
+    args = parser.parse_args(argv)
+
+    extension = [{ext.lstrip('.') for ext in value.split(',')} for value in args.extension or ["py,tar.gz"]]
+    directories = synthetic_tree(args.size)
+
+    legacy, legacy_seconds = _timed(lambda: run_legacy(directories, extension))
+    matched, matcher_seconds = _timed(lambda: run_matcher(directories, extension))
+    # Прежняя проверка не знает шаблонов и исключений, поэтому число совпадений может отличаться.
+    print(f"{'legacy':>8}: {legacy_seconds:8.3f} с ({args.size / legacy_seconds:12.1f} имен/с), совпало {legacy}")
+    print(f"{'matcher':>8}: {matcher_seconds:8.3f} с ({args.size / matcher_seconds:12.1f} имен/с), совпало {matched}")
+    print(f"Ускорение: {legacy_seconds / matcher_seconds:.1f}x")
+
+    if args.path is not None:
+        entries, seconds = _timed(lambda: run_walk(args.path.resolve(), extension))
+        print(f"{'walk':>8}: {seconds:8.3f} с, выведено {entries} элементов")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
+import io
+import json
 import os
+import sys
 
 from collections.abc import Generator
 from contextlib import contextmanager
@@ -11,7 +14,7 @@ import pytest
 
 from pytest import CaptureFixture
 
-from tree import main
+from tree import Budget, Entry, ListingCache, Walker, iter_records, main, write_lines
 
 PROG = "tree"
 
@@ -1210,3 +1213,393 @@ def test__tree__multiple_options(
   #   print(contents)
     assert stdout == ""
     assert contents == dedent(expected)
+
+
+@pytest.mark.parametrize("jobs", ["1", "4"])
+def test__tree__jobs(jobs: str, sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: результат не зависит от числа потоков обхода."""
+    for name in ("b", "a"):
+        directory = sandbox / name
+        directory.mkdir()
+        (directory / "nested").mkdir()
+        (directory / "nested" / "file.txt").touch()
+        (directory / "file.txt").touch()
+
+    main(["--jobs", jobs, sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+    stdout = captured.out
+
+    expected = f"""\
+    {sandbox.as_posix()}/
+        a/
+            nested/
+                file.txt
+            file.txt
+        b/
+            nested/
+                file.txt
+            file.txt
+    """
+
+    assert stdout == dedent(expected)
+
+
+def test__tree__jobs__invalid(sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: число потоков должно быть положительным."""
+    with pytest.raises(SystemExit) as context:
+        main(["--jobs", "0", sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+    stderr = captured.err
+
+    assert context.value.code == 2
+    assert f"{PROG}: error: " in stderr
+
+
+def test__tree__stats(sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: статистика обхода выводится в поток ошибок."""
+    directory = sandbox / "directory"
+    directory.mkdir()
+    (directory / "file.txt").touch()
+
+    main(["--stats", sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+
+    assert captured.out == f"{sandbox.as_posix()}/\n    directory/\n        file.txt\n"
+    assert "directories=2" in captured.err
+    assert "files=1" in captured.err
+
+
+def test__tree__symlink_to_directory(sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: символические ссылки на директории не выводятся и не обходятся."""
+    directory = sandbox / "directory"
+    directory.mkdir()
+    (directory / "file.txt").touch()
+
+    symlink = sandbox / "symlink"
+    symlink.symlink_to(directory)
+
+    main([sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+    stdout = captured.out
+
+    expected = f"""\
+    {sandbox.as_posix()}/
+        directory/
+            file.txt
+    """
+
+    assert stdout == dedent(expected)
+
+
+@pytest.mark.parametrize("options", [["--prune"], ["--extension", ".md"]])
+def test__tree__prune__does_not_modify_filesystem(
+    options: list[str], sandbox: Path, capsys: CaptureFixture
+) -> None:
+    """Кейс: фильтрация не удаляет пустые директории, отфильтрованные файлы и ссылки."""
+    empty_directory = sandbox / "directory" / "empty"
+    empty_directory.mkdir(parents=True)
+
+    file = sandbox / "file.txt"
+    file.touch()
+
+    symlink = sandbox / "symlink"
+    symlink.symlink_to(empty_directory)
+
+    main([*options, sandbox.as_posix()])
+
+    assert empty_directory.is_dir()
+    assert file.is_file()
+    assert symlink.is_symlink()
+
+
+def test__tree__prune__limited_depth(sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: при ограничении глубины учитываются файлы глубже выводимого уровня."""
+    nested_directory = sandbox / "directory" / "nested"
+    nested_directory.mkdir(parents=True)
+    (nested_directory / "file.md").touch()
+
+    empty_directory = sandbox / "empty" / "nested"
+    empty_directory.mkdir(parents=True)
+
+    main(["--prune", "--depth", "2", "--stats", sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+    stdout = captured.out
+
+    expected = f"""\
+    {sandbox.as_posix()}/
+        directory/
+            nested/
+    """
+
+    assert stdout == dedent(expected)
+    assert "scandir_calls=5" in captured.err
+    assert "syscalls_saved_estimate=" in captured.err
+
+
+def test__tree__format__ndjson(sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: вывод записей в формате NDJSON."""
+    directory = sandbox / "directory"
+    directory.mkdir()
+
+    file = directory / "file.txt"
+    file.write_text("Hello, HSE")
+
+    main(["--format", "ndjson", sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+    records = [json.loads(line) for line in captured.out.splitlines()]
+
+    assert [(record["path"], record["type"], record["depth"]) for record in records] == [
+        (sandbox.as_posix(), "directory", 0),
+        (directory.as_posix(), "directory", 1),
+        (file.as_posix(), "file", 2),
+    ]
+    assert records[-1]["size"] == len("Hello, HSE")
+
+
+def test__tree__vanished_entries(sandbox: Path) -> None:
+    """Кейс: элементы, удаленные во время обхода, пропускаются."""
+    file = sandbox / "file.txt"
+    file.write_text("Hello, HSE")
+    entries = [
+        (0, Entry("missing", (sandbox / "missing").as_posix(), True)),
+        (0, Entry("file.txt", file.as_posix(), False)),
+    ]
+
+    records = list(iter_records(sandbox, iter(entries)))
+
+    assert [record["path"] for record in records] == [sandbox.as_posix(), file.as_posix()]
+    assert Walker().list_directory((sandbox / "missing").as_posix()) == ([], [])
+
+
+class _Terminal(io.StringIO):
+    """Поток, который притворяется терминалом и запоминает содержимое при каждом сбросе."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.flushed: list[str] = []
+
+    def isatty(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        self.flushed.append(self.getvalue())
+
+
+def test__tree__terminal_flush() -> None:
+    """Кейс: в терминал каждая строка сбрасывается сразу, а не пачкой."""
+    stream = _Terminal()
+
+    write_lines(iter(["a\n", "b\n", "c\n"]), stream, batch_size=100)
+
+    assert stream.flushed == ["a\n", "a\nb\n", "a\nb\nc\n"]
+
+
+@pytest.mark.parametrize("option", ["-o", "--output"])
+def test__tree__format__json(option: str, sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: вывод в формате JSON в файл с учетом фильтра по расширению."""
+    (sandbox / "file.md").touch()
+    (sandbox / "file.txt").touch()
+
+    with cd(sandbox):
+        main(["--format", "json", option, "./output.json", "-e", "md", sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+    records = json.loads((sandbox / "output.json").read_text())
+
+    assert captured.out == ""
+    assert [record["path"] for record in records] == [sandbox.as_posix(), (sandbox / "file.md").as_posix()]
+
+
+def _age(*paths: Path) -> None:
+    """Сдвинуть mtime в прошлое, чтобы листинги попадали в кеш."""
+    for path in paths:
+        os.utime(path, (0, 0))
+
+
+def test__tree__cache(sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: повторный запуск берет листинги из кеша и видит изменения."""
+    root = sandbox / "root"
+    directory = root / "directory"
+    directory.mkdir(parents=True)
+    (directory / "file.txt").touch()
+    _age(root, directory)
+
+    cache = sandbox / "cache.json"
+    main(["--cache", cache.as_posix(), "--stats", root.as_posix()])
+    first = capsys.readouterr()
+
+    main(["--cache", cache.as_posix(), "--stats", root.as_posix()])
+    second = capsys.readouterr()
+
+    assert second.out == first.out
+    assert "scandir_calls=0" in second.err
+    assert "cache_hits=2" in second.err
+
+    (directory / "another_file.txt").touch()
+    main(["--cache", cache.as_posix(), "--stats", root.as_posix()])
+    third = capsys.readouterr()
+
+    assert "another_file.txt" in third.out
+    assert "scandir_calls=1" in third.err
+
+    main(["--cache", cache.as_posix(), "--no-cache", "--stats", root.as_posix()])
+    fourth = capsys.readouterr()
+
+    assert "scandir_calls=2" in fourth.err
+
+
+def test__tree__cache__eviction(sandbox: Path) -> None:
+    """Кейс: при переполнении вытесняются записи, которые дольше всего не использовались."""
+    directories = [sandbox / f"directory_{index}" for index in range(3)]
+    for directory in directories:
+        directory.mkdir()
+    _age(*directories)
+
+    path = sandbox / "cache.json"
+    cache = ListingCache(path)
+    for directory in directories:
+        cache.put(directory.as_posix(), os.lstat(directory), [], [])
+    cache.save()
+
+    cache = ListingCache(path, max_entries=2)
+    for directory in directories[1:]:
+        assert cache.get(directory.as_posix(), os.lstat(directory)) == ([], [])
+    cache.save()
+
+    cache = ListingCache(path)
+    assert cache.get(directories[0].as_posix(), os.lstat(directories[0])) is None
+    for directory in directories[1:]:
+        assert cache.get(directory.as_posix(), os.lstat(directory)) == ([], [])
+
+
+@pytest.mark.parametrize(
+    ("extensions", "expected_files"),
+    [
+        (["*.min.js"], ["app.min.js"]),
+        (["js", "!*.min.js"], ["app.js"]),
+        (["!md"], ["app.js", "app.min.js", "archive.pkg.tar.gz"]),
+        (["pkg.tar.gz"], ["archive.pkg.tar.gz"]),
+    ],
+)
+def test__tree__filter_by_extension__patterns(
+    extensions: list[str], expected_files: list[str], sandbox: Path, capsys: CaptureFixture
+) -> None:
+    """Кейс: шаблоны, исключения и длинные многоуровневые расширения."""
+    for name in ("app.js", "app.min.js", "archive.pkg.tar.gz", "README.md"):
+        (sandbox / name).touch()
+
+    main([*(f"--extension={extension}" for extension in extensions), sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+    stdout = captured.out
+
+    expected = f"{sandbox.as_posix()}/\n" + "".join(f"    {name}\n" for name in expected_files)
+
+    assert stdout == expected
+
+
+@pytest.mark.parametrize("options", [[], ["--prune"]])
+def test__tree__deep_directory(options: list[str], sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: глубина дерева больше лимита рекурсии."""
+    levels = sys.getrecursionlimit() + 100
+    with cd(sandbox):
+        for _ in range(levels):
+            os.mkdir("a")
+            os.chdir("a")
+        Path("file.txt").touch()
+
+    main([*options, sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+
+    assert len(lines) == levels + 2
+    assert lines[-1] == " " * (4 * (levels + 1)) + "file.txt"
+
+
+def test__tree__max_entries(sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: ограничение на число выводимых элементов."""
+    for name in ("a", "b", "c"):
+        directory = sandbox / name
+        directory.mkdir()
+        (directory / "file.txt").touch()
+
+    main(["--max-entries", "3", sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+    stdout = captured.out
+
+    expected = f"""\
+    {sandbox.as_posix()}/
+        a/
+            file.txt
+        b/
+    """
+
+    assert stdout == dedent(expected)
+    assert "tree: " in captured.err
+
+
+def test__tree__max_entries__exact(sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: дерево ровно из `max_entries` элементов выводится без предупреждения."""
+    for name in ("a", "b", "c"):
+        (sandbox / name).touch()
+
+    main(["--max-entries", "3", sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+
+    assert captured.out.splitlines()[1:] == ["    a", "    b", "    c"]
+    assert captured.err == ""
+
+
+def test__tree__max_entries__no_extra_pull() -> None:
+    """Кейс: после исчерпания лимита запрашивается не больше одного лишнего элемента."""
+    pulled = []
+
+    def entries(count: int) -> Generator[int, None, None]:
+        for item in range(count):
+            pulled.append(item)
+            yield item
+
+    budget = Budget(max_entries=3)
+
+    assert list(budget.take(entries(10))) == [0, 1, 2]
+    assert pulled == [0, 1, 2, 3]
+    assert budget.exhausted is not None
+
+    budget = Budget(max_entries=3)
+
+    assert list(budget.take(entries(3))) == [0, 1, 2]
+    assert budget.exhausted is None
+    assert list(Budget(max_entries=0).take(entries(10))) == []
+
+
+def test__tree__timeout(sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: по истечении времени выводится полученная часть дерева."""
+    (sandbox / "file.txt").touch()
+
+    main(["--timeout", "1e-9", sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+
+    assert captured.out == f"{sandbox.as_posix()}/\n"
+    assert "tree: " in captured.err
+
+
+@pytest.mark.parametrize("options", [["--max-entries", "-1"], ["--timeout", "0"]])
+def test__tree__budget__invalid(options: list[str], sandbox: Path, capsys: CaptureFixture) -> None:
+    """Кейс: некорректные ограничения."""
+    with pytest.raises(SystemExit) as context:
+        main([*options, sandbox.as_posix()])
+
+    captured = capsys.readouterr()
+
+    assert context.value.code == 2
+    assert f"{PROG}: error: " in captured.err